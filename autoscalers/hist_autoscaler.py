@@ -55,7 +55,7 @@ class HistAutoscaler(Autoscaler):
         hour, day = SimUtils.get_hour_and_day_for_ts(self.sim.ts_now)
         self.histogram[hour] += [server_load]
         results = self.estimate_amount_of_tasks(hour)
-        self.logger.log("Initial estimation of machines: {0}".format(results), 'debug')
+        self.logger.log("Initial estimation of machines: %s", 'debug', results)
         counter = 0
         # Grab the last 10 errors
         for i in self.error_past_hours[-10:]:
@@ -1,4 +1,5 @@
 import os
+from operator import attrgetter
 
 import toposort
 from sortedcontainers import SortedListWithKey
@@ -7,6 +8,11 @@ from core import SimCore, Constants
 from core.SimLogger import DBLogger
 from utils import SimUtils
 
+MONITOR_SITE_STATUS_PARAMS = {'type': Constants.CQ2CQs_MONITOR_SITE_STATUS}
+
+# all task queues are ordered by submission time
+task_submit_key = attrgetter('ts_submit')
+
 
 class CentralQueue(SimCore.SimEntity):
     """Central queue for new tasks."""
@@ -40,13 +46,14 @@ class CentralQueue(SimCore.SimEntity):
         #       despite a lack of updates to the global state.
         #       The current implementation is not event-driven!
         self._tasks_pending_dependencies = SortedListWithKey(
-            key=lambda task: task.ts_submit)
+            key=task_submit_key)
         # - Tasks that are not eligible for execution because they have not
         #   yet been submitted
         self._tasks_submitted_after_now = SortedListWithKey(
-            key=lambda task: task.ts_submit)
+            key=task_submit_key)
         # - Tasks that are ready for execution
-        self._ready_tasks = SortedListWithKey(key=lambda task: task.ts_submit)
+        self._ready_tasks = SortedListWithKey(key=task_submit_key)
+        self._ready_tasks_cpus = 0  # cpus requested by the tasks in _ready_tasks
 
         # Each site stat is a 5-tuple of (free_resources, site_name,
         # site_id, is_leased_instance, expiration_ts)
@@ -73,12 +80,18 @@ class CentralQueue(SimCore.SimEntity):
                 task.ts_submit = max(task.ts_submit - first_ts_submit, 0)
 
         # Create separate lists of tasks with pending dependencies and tasks
-        # with fulfilled dependencies
+        # with fulfilled dependencies; each list is then sorted in one go
+        # (traces usually arrive ordered by submission time already, which
+        # the sort handles in linear time)
+        tasks_without_dependencies = []
+        tasks_with_dependencies = []
         for task in task_list:
             if not task.dependencies:
-                self._tasks_submitted_after_now.add(task)
+                tasks_without_dependencies.append(task)
             else:
-                self._tasks_pending_dependencies.add(task)
+                tasks_with_dependencies.append(task)
+        self._tasks_submitted_after_now.update(tasks_without_dependencies)
+        self._tasks_pending_dependencies.update(tasks_with_dependencies)
 
         # logger.log('Task list:\n{0}\nFirstSubmitAtZero: {1}'.format(
         #     pprint.pformat(self.task_queue),
@@ -108,31 +121,28 @@ class CentralQueue(SimCore.SimEntity):
         """First monitor sites, then reschedule tasks."""
 
         self.events.enqueue(
-            SimCore.Event(self.sim.ts_now, self.id, self.id, {'type': Constants.CQ2CQs_MONITOR_SITE_STATUS}))
+            SimCore.Event(self.sim.ts_now, self.id, self.id, MONITOR_SITE_STATUS_PARAMS))
 
     def monitor_sites(self, params):
         """Get monitoring information from existing sites: read queue length."""
 
-        self.total_available_resources = 0
+        # total_available_resources follows the site stats as they are updated
         for site in self.sim.sites:
             if site.status == Constants.STATUS_SHUTDOWN:
                 if site.id in self._site_id_index_map:
                     self.remove_site_stats(site.id)
                 continue
-            
-            new_site_free_resources = site.free_resources - sum(task.cpus for task in site.task_queue)
-            self.total_available_resources += new_site_free_resources
 
             site_index = self._site_id_index_map[site.id]
-            self.set_site_free_resources(site_index, new_site_free_resources)
+            self.set_site_free_resources(site_index, site.free_resources - site.queued_cpus)
 
         # schedule the next monitoring event
         self.events.enqueue(
             SimCore.Event(self.sim.ts_now + self.N_TICKS_MONITOR_SITE_STATUS, self.id, self.id,
-                          {'type': Constants.CQ2CQs_MONITOR_SITE_STATUS}))
+                          MONITOR_SITE_STATUS_PARAMS))
 
     def add_site_stats(self, site):
-        site_free_resources = site.free_resources - sum(task.cpus for task in site.task_queue)
+        site_free_resources = site.free_resources - site.queued_cpus
         self.total_available_resources += site_free_resources
         
         new_site_stat = (
@@ -184,14 +194,11 @@ class CentralQueue(SimCore.SimEntity):
         last_site_stat = self._site_stats[site_index]
         if last_site_stat[0] == new_site_free_resources:
             return
+
+        self.total_available_resources += new_site_free_resources - last_site_stat[0]
         
-        new_site_stat = (
-            new_site_free_resources,
-            last_site_stat[1],
-            last_site_stat[2],
-            last_site_stat[3],
-            last_site_stat[4]
-        )
+        # only free_resources changes; the other fields are shared with the old stat
+        new_site_stat = (new_site_free_resources,) + last_site_stat[1:]
 
         self._site_stats[site_index] = new_site_stat
         self._site_stats_sorted.remove((site_index, last_site_stat))
@@ -211,6 +218,7 @@ class CentralQueue(SimCore.SimEntity):
         for task in new_ready_tasks:
             self._tasks_submitted_after_now.remove(task)
             self._ready_tasks.add(task)
+            self._ready_tasks_cpus += task.cpus
 
     def tasks_to_schedule(self):
         """
@@ -224,6 +232,25 @@ class CentralQueue(SimCore.SimEntity):
 
     def remove_task_to_schedule(self, task):
         self._ready_tasks.remove(task)
+        self._ready_tasks_cpus -= task.cpus
+
+    def remove_tasks_to_schedule(self, tasks):
+        ready_tasks = self._ready_tasks
+
+        # removing a task scans all ready tasks with its ts_submit, and workflows submit many
+        # tasks at once, so for larger batches rebuild the ready queue (in place, as the
+        # schedulers hold on to it) from the tasks left; the rebuild keeps their order
+        if len(tasks) * 4 >= len(ready_tasks):
+            scheduled_tasks = set(tasks)
+            remaining_tasks = [task for task in ready_tasks if task not in scheduled_tasks]
+            ready_tasks.clear()
+            ready_tasks.update(remaining_tasks)
+        else:
+            remove = ready_tasks.remove
+            for task in tasks:
+                remove(task)
+
+        self._ready_tasks_cpus -= sum(task.cpus for task in tasks)
 
     def try_schedule_tasks(self):
         """
@@ -253,7 +280,7 @@ class CentralQueue(SimCore.SimEntity):
         # Move tasks to ready queue to ensure we count all eligible tasks
         self._check_tasks_submitted_after_now()
 
-        load = sum(task.cpus for task in self._ready_tasks)
+        load = self._ready_tasks_cpus
 
         # Also count tasks that are in the queue with dependencies not resolved yet.
         for task in self._tasks_pending_dependencies:
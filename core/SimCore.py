@@ -23,7 +23,7 @@ import logging
 import os
 import sys
 
-from sortedcontainers import SortedList
+from sortedcontainers import SortedList, SortedListWithKey
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -49,16 +49,21 @@ class Event(object):
     src        -- the event generator
     dest       -- the event receiver
     params     -- application-dependent (in particular, event-dependent) parameters
+                  (read-only, so events without other parameters can share one dict)
+    type       -- params['type'], kept in its own slot as events are ordered by it
     """
 
+    __slots__ = ('ts_arrival', 'src', 'dest', 'params', 'type')
+
     def __init__(self, ts_arrival, source, destination, params):
         self.ts_arrival = ts_arrival
         self.src = source
         self.dest = destination
         self.params = params
+        self.type = params.get('type') if params else None
 
     def __str__(self):
-        return '{0}: {1}'.format(self.__class__, self.__dict__)
+        return '{0}: {1}'.format(self.__class__, dict((name, getattr(self, name)) for name in self.__slots__))
 
     def __eq__(self, other):
         """Checks if other's attributes have the same value."""
@@ -66,13 +71,26 @@ class Event(object):
         if self.__class__ != other.__class__:
             return False
 
-        return self.__dict__ == other.__dict__
+        return self.ts_arrival == other.ts_arrival and self.src == other.src and \
+            self.dest == other.dest and self.params == other.params
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __cmp__(self, other):
-        return 1 if self.params['type'] > other.params['type'] else -1
+        return 1 if self.type > other.type else -1
+
+
+def reverse_event_priority(event):
+    """
+    Sort key for the events sharing an arrival time, which are dequeued by
+    ascending type and, within a type, the latest enqueued first (as
+    Event.__cmp__ never reports two events as equal). The per-timestamp lists
+    are kept in the reverse of that order, so the next event is popped off
+    their end, and the key is a plain number, so bisecting them compares ints.
+    """
+
+    return -event.type if event.type is not None else float('inf')
 
 
 class EventQueue(object):
@@ -104,15 +122,35 @@ class EventQueue(object):
 
         # Searching a list for an item is linear-time, while searching a dict for an item is constant time.
         # Src: http://jaynes.colorado.edu/PythonIdioms.html
-        if timestamp_arrival not in self.timestamps:  # O(log(n)), n number of timestamps
+        event_queue = self.events.get(timestamp_arrival)  # O(1), every registered timestamp has a dict entry
+        if event_queue is None:
             self.timestamps.add(timestamp_arrival)  # insert and sort O(log n), n number of timestamps
-            self.events[timestamp_arrival] = SortedList()
+            event_queue = self.events[timestamp_arrival] = SortedListWithKey(key=reverse_event_priority)
 
         # avoid appending identical events one after another
-        if not self.events[timestamp_arrival] or self.events[timestamp_arrival][-1] != event:
-            self.events[timestamp_arrival].add(event)
+        if not event_queue or event_queue[0] != event:
+            event_queue.add(event)
             self.count_events_in += 1
 
+    def enqueue_many(self, events):
+        """Adds several events to the queue, in the given order."""
+
+        # batches usually share a timestamp, so only look its queue up again when it changes
+        timestamp_arrival = None
+        event_queue = None
+        for event in events:
+            if event.ts_arrival != timestamp_arrival:
+                timestamp_arrival = event.ts_arrival
+                event_queue = self.events.get(timestamp_arrival)
+                if event_queue is None:
+                    self.timestamps.add(timestamp_arrival)
+                    event_queue = self.events[timestamp_arrival] = SortedListWithKey(key=reverse_event_priority)
+
+            # avoid appending identical events one after another
+            if not event_queue or event_queue[0] != event:
+                event_queue.add(event)
+                self.count_events_in += 1
+
     def dequeue(self):
         """Returns (and removes from the queue) the next event."""
 
@@ -123,7 +161,7 @@ class EventQueue(object):
 
         first_timestamp = self.timestamps[0]
         event_queue = self.events.get(first_timestamp)
-        next_event = event_queue.pop(0)
+        next_event = event_queue.pop()
 
         if not event_queue:  # no more events for this time stamp
             del self.events[first_timestamp]
@@ -141,7 +179,7 @@ class EventQueue(object):
 
         first_timestamp = self.timestamps[0]
         event_queue = self.events.get(first_timestamp)
-        return event_queue[0]
+        return event_queue[-1]
 
 
 class SimEntity(object):
@@ -192,20 +230,18 @@ class SimEntity(object):
         pass
 
     def validate_event(self, event):
-        """Can be overwritten by subclass to check for other attributes."""
+        """An event is valid if this entity has a handler for its type (None without params or type)."""
 
-        return False if event.params is None or \
-                        'type' not in event.params or \
-                        event.params['type'] not in self.events_map \
-        else True
+        return event.type in self.events_map
 
     def dispatch(self, event):
-        if not self.validate_event(event):
+        # a single events_map lookup both validates the event and finds its handler
+        handler = self.events_map.get(event.type)
+        if handler is None:
             raise Exception('Failed to validate event {0}'.format(event))
 
         # call the event's handler, and pass to it the event's parameters
-        event_type = event.params['type']
-        self.events_map[event_type](event.params)
+        handler(event.params)
 
 
 class EntityRegistry(object):
@@ -268,7 +304,7 @@ class CSimulation(object):
         else:
             # just for debugging purposes atm, it can be deleted in the future
             # it should signal that a site was dropped
-            logger.debug('Can\'t deliver event {0}, entity {1} no longer regirested'.format(event, event.dest), extra={'ts_now': self.ts_now})
+            logger.debug('Can\'t deliver event %s, entity %s no longer regirested', event, event.dest, extra={'ts_now': self.ts_now})
 
     def start(self, ts_end):
         """Overwrite for your own simulation."""
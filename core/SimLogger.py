@@ -121,9 +121,9 @@ class DBLogger(object):
     def flush(self):
         if not self.config['simulation']['LoggingEnabled']: return
         if self.iLastIndex > 0:
-            self.WriteCursor.executemany(
-                "insert into `Log` (`line_no`, `real_time`, `sim_time`, `message`) values (NULL, ?, ?, ?)", self.Buffer)
-            self.DBLog.commit()
+            with self.DBLog.bulk():
+                self.WriteCursor.executemany(
+                    "insert into `Log` (`line_no`, `real_time`, `sim_time`, `message`) values (NULL, ?, ?, ?)", self.Buffer)
             self.Buffer = []
             self.iLastIndex = 0
 
@@ -138,8 +138,19 @@ class DBLogger(object):
         if self.iLastIndex == self.BufferSize:
             self.flush()
 
-    def log(self, message, log_level='info'):
-        if not self.config['simulation']['LoggingEnabled']: return
+    def enabled_for(self, log_level='info'):
+        """Tells if log() would emit messages of log_level, so callers can skip building them."""
+
+        if not self.config['simulation']['LoggingEnabled']: return False
+
+        if isinstance(log_level, basestring):
+            log_level = logging.getLevelName(log_level.upper())
+        return self._logger.isEnabledFor(log_level)
+
+    def log(self, message, log_level='info', *args):
+        """Logs message, %-formatted with args only if log_level is enabled."""
+
+        if not self.enabled_for(log_level): return
 
         frame = inspect.currentframe().f_back
         if frame.f_code.co_name == 'log_and_db':
@@ -159,9 +170,9 @@ class DBLogger(object):
         }
 
         if isinstance(log_level, basestring):
-            getattr(self._logger, log_level)(message, extra=extra)
+            getattr(self._logger, log_level)(message, *args, extra=extra)
         else:
-            self._logger.log(log_level, message, extra=extra)
+            self._logger.log(log_level, message, *args, extra=extra)
 
     def log_and_db(self, message, log_level='info'):
         if not self.config['simulation']['LoggingEnabled']: return
@@ -214,11 +225,11 @@ class DBTaskTrace(object):
 
     def flush(self):
         if self.iLastIndex > 0:
-            self.WriteCursor.executemany("""
-                insert into `FinishedTasks`(`task_id`, `sub_site`, `exec_site`, `user`, `ts_submit`, `ts_start`, `ts_stop`, `result`, `ncpus`, `visited_sites`)
-                values (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, self.Buffer)
-            self.DB.commit()
+            with self.DB.bulk():
+                self.WriteCursor.executemany("""
+                    insert into `FinishedTasks`(`task_id`, `sub_site`, `exec_site`, `user`, `ts_submit`, `ts_start`, `ts_stop`, `result`, `ncpus`, `visited_sites`)
+                    values (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, self.Buffer)
             self.Buffer = []
             self.iLastIndex = 0
 
@@ -228,6 +239,14 @@ class DBTaskTrace(object):
         if self.iLastIndex == self.BufferSize:
             self.flush()
 
+    def addFinishedTasks(self, rows):
+        """Adds several rows at once, each a tuple with the arguments of addFinishedTask."""
+
+        self.Buffer.extend(rows)
+        self.iLastIndex += len(rows)
+        if self.iLastIndex >= self.BufferSize:
+            self.flush()
+
 
 class DBStats(object):
     NO_TABLES = 5
@@ -329,24 +348,30 @@ class DBStats(object):
             self.iLastIndex[Table] = 0
 
     def close(self):
+        self.flushall()
         for Table in self.TABLE_NAMES:
-            self.flush(Table)
             self.WriteCursor[Table].close()
-            self.DB.close()
+        self.DB.close()
 
-    def flush(self, Table):
+    def _write(self, Table):
+        """Insert the buffered rows of the table, leaving the commit to the caller."""
         if self.iLastIndex[Table] > 0:
             self.WriteCursor[Table].executemany("""
                 insert into `""" + str(self.TABLE_NAMES[Table]) + """`""" + str(self.TABLE_INSERT_FORMAT[Table][0]) + """
                 values """ + str(self.TABLE_INSERT_FORMAT[Table][1]) + """
                 """, self.Buffer[Table])
-            self.DB.commit()
             self.Buffer[Table] = []
             self.iLastIndex[Table] = 0
 
+    def flush(self, Table):
+        with self.DB.bulk():
+            self._write(Table)
+
     def flushall(self):
-        for Table in self.TABLE_NAMES:
-            self.flush(Table)
+        # -- all tables are written in a single transaction
+        with self.DB.bulk():
+            for Table in self.TABLE_NAMES:
+                self._write(Table)
 
     def addNoMessages(self, sim_time, id_message_type, no_messages):
         Table = self.TABLE_NoMessages
@@ -355,6 +380,16 @@ class DBStats(object):
         if self.iLastIndex[Table] == self.BufferSize:
             self.flush(Table)
 
+    def addNoMessagesBulk(self, sim_time, messages_per_type):
+        """Adds one row per (id_message_type, no_messages) pair, all for sim_time."""
+
+        Table = self.TABLE_NoMessages
+        self.Buffer[Table].extend((sim_time, id_message_type, no_messages)
+                                  for id_message_type, no_messages in messages_per_type)
+        self.iLastIndex[Table] += len(messages_per_type)
+        if self.iLastIndex[Table] >= self.BufferSize:
+            self.flush(Table)
+
     def addSiteStats(self, sim_time, id_stat_type, id_source, ivalue=None, fvalue=None, svalue=None):
         Table = self.TABLE_SiteStats
         self.Buffer[Table].append((sim_time, id_stat_type, id_source, ivalue, fvalue, svalue))
@@ -1,5 +1,4 @@
 import bisect
-import operator
 import sys
 
 import numpy as np
@@ -9,6 +8,9 @@ from core import Constants, SimCore
 if "utils" not in sys.path: sys.path.append("utils")
 from utils import SimUtils
 
+MONITOR_PARAMS = {'type': Constants.SM2SMs_MONITOR}
+UPDATE_STATISTICS_PARAMS = {'type': Constants.SM2SMs_UPDATE_STATISTICS}
+
 
 class CTSiteStatType:
     TASK_ARRIVAL_RATE = 0
@@ -23,6 +25,23 @@ class CTSiteStatType:
 
 
 class SiteMonitor(object):
+    __slots__ = (
+        'site',
+        'AMOUNT_OF_DAYS_HISTORY',
+        'AMOUNT_OF_MINUTES_TO_TRACK',
+        'stats_Total_NTasksIn',
+        'stats_Total_NTasksStarted',
+        'stats_Total_NTasksFinished',
+        'stats_Total_NInterrupted',
+        'stats_Total_ConsumedCPUTime',
+        'stats_LRTU_NTasksIn',
+        'stats_LRTU_NTasksStarted',
+        'stats_LRTU_NTasksFinished',
+        'stats_LRTU_ConsumedCPUTime',
+        'task_arrived_last_minutes',
+        'tasks_arrival_per_day',
+    )
+
     def __init__(self, site):
         self.site = site
 
@@ -103,7 +122,7 @@ class SiteMonitor(object):
 
         past_arrivals_per_hour = []
 
-        for i in xrange(max(0, day - self.AMOUNT_OF_DAYS_HISTORY), day):
+        for i in range(max(0, day - self.AMOUNT_OF_DAYS_HISTORY), day):
             if i in self.tasks_arrival_per_day:
                 past_arrivals_per_hour.append(self.tasks_arrival_per_day[i][hour])
 
@@ -123,25 +142,25 @@ class SiteMonitor(object):
         #      "Resources:" + str(site.resources) +'/' + str(site.used_resources) + "("+\
         #      "%.2f%%" % (100.0 * site.used_resources/site.resources) + ") (All/Free[%])")
         site = self.site
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.N_TASKS_ARRIVED, site.id,
-                                      ivalue=self.stats_LRTU_NTasksIn)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.TASK_ARRIVAL_RATE, site.id,
-                                      fvalue=float(self.stats_LRTU_NTasksIn) / site.report_interval)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.N_TASKS_STARTED, site.id,
-                                      ivalue=self.stats_LRTU_NTasksStarted)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.TASK_START_RATE, site.id,
-                                      fvalue=float(self.stats_LRTU_NTasksStarted) / site.report_interval)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.N_TASKS_FINISHED, site.id,
-                                      ivalue=self.stats_LRTU_NTasksFinished)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.TASK_FINISH_RATE, site.id,
-                                      fvalue=float(self.stats_LRTU_NTasksFinished) / site.report_interval)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.TOTAL_CPUTIME, site.id,
-                                      ivalue=self.stats_Total_ConsumedCPUTime + self.getRunningTasksConsumedTime())
-        itmp = self.getRunningTasksConsumedTime_LRTU()
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.TOTAL_CPUTIME_LRTU, site.id,
-                                      ivalue=self.stats_LRTU_ConsumedCPUTime + itmp)
-        site.sim.DBStats.addSiteStats(site.sim.ts_now, CTSiteStatType.CPUTIME_RATE, site.id,
-                                      fvalue=float(self.stats_LRTU_ConsumedCPUTime + itmp) / site.report_interval)
+        site_id = site.id
+        ts_now = site.sim.ts_now
+        report_interval = float(site.report_interval)
+        addSiteStats = site.sim.DBStats.addSiteStats
+
+        addSiteStats(ts_now, CTSiteStatType.N_TASKS_ARRIVED, site_id, ivalue=self.stats_LRTU_NTasksIn)
+        addSiteStats(ts_now, CTSiteStatType.TASK_ARRIVAL_RATE, site_id,
+                     fvalue=self.stats_LRTU_NTasksIn / report_interval)
+        addSiteStats(ts_now, CTSiteStatType.N_TASKS_STARTED, site_id, ivalue=self.stats_LRTU_NTasksStarted)
+        addSiteStats(ts_now, CTSiteStatType.TASK_START_RATE, site_id,
+                     fvalue=self.stats_LRTU_NTasksStarted / report_interval)
+        addSiteStats(ts_now, CTSiteStatType.N_TASKS_FINISHED, site_id, ivalue=self.stats_LRTU_NTasksFinished)
+        addSiteStats(ts_now, CTSiteStatType.TASK_FINISH_RATE, site_id,
+                     fvalue=self.stats_LRTU_NTasksFinished / report_interval)
+        addSiteStats(ts_now, CTSiteStatType.TOTAL_CPUTIME, site_id,
+                     ivalue=self.stats_Total_ConsumedCPUTime + self.getRunningTasksConsumedTime())
+        itmp = self.stats_LRTU_ConsumedCPUTime + self.getRunningTasksConsumedTime_LRTU()
+        addSiteStats(ts_now, CTSiteStatType.TOTAL_CPUTIME_LRTU, site_id, ivalue=itmp)
+        addSiteStats(ts_now, CTSiteStatType.CPUTIME_RATE, site_id, fvalue=itmp / report_interval)
 
 
 class SystemMonitor(SimCore.SimEntity):
@@ -181,9 +200,9 @@ class SystemMonitor(SimCore.SimEntity):
     def activate(self):
         # schedule a monitoring event for time=NOW
         self.events.enqueue(
-            SimCore.Event(self.sim.ts_now, self.id, self.id, {'type': Constants.SM2SMs_MONITOR}))
+            SimCore.Event(self.sim.ts_now, self.id, self.id, MONITOR_PARAMS))
         self.events.enqueue(
-            SimCore.Event(self.sim.ts_now, self.id, self.id, {'type': Constants.SM2SMs_UPDATE_STATISTICS}))
+            SimCore.Event(self.sim.ts_now, self.id, self.id, UPDATE_STATISTICS_PARAMS))
 
     def getNTasksToCome(self):
         """Tasks that have not yet been submitted for processing on a site."""
@@ -192,12 +211,11 @@ class SystemMonitor(SimCore.SimEntity):
     def count_tasks_too_large(self):
         if not self.sim.sites:
             return 0
-        largest_site = max(self.sim.sites, key=operator.attrgetter('resources'))
-        max_resources = largest_site.resources
+        max_resources = self.sim.resource_manager.max_site_resources
         return self.sim.central_queue.count_tasks_above_resource_limit(max_resources)
 
     def count_idle_resources(self):
-        return sum(site.free_resources for site in self.sim.sites if site.status == Constants.STATUS_RUNNING)
+        return self.sim.resource_manager.get_idle_capacity()
 
     def get_total_tasks_in(self):
         # self.refresh_sstats(None)
@@ -211,12 +229,8 @@ class SystemMonitor(SimCore.SimEntity):
         return total_num_tasks
 
     def get_total_load(self):
-        total_load = 0
         # add number of running tasks and tasks that have been submitted to central queue
-        for site in self.sim.sites:
-            total_load += sum(task.cpus for task in site.running_tasks.values())
-            total_load += sum(task.cpus for task in site.task_queue)
-
+        total_load = self.sim.resource_manager.sites_load
         total_load += self.get_pending_tasks_load()
 
         return total_load
@@ -245,38 +259,49 @@ class SystemMonitor(SimCore.SimEntity):
 
         return total_observed
 
+    def _update_site_stat(self, stat_per_site, site_id, value):
+        """Stores the latest value of a site statistic and returns by how much it changed."""
+
+        delta = value - stat_per_site.get(site_id, 0)
+        stat_per_site[site_id] = value
+        return delta
+
     def refresh_sstats(self, params):
         """Get and sum stats from all sites."""
 
-        # loop over shallow copy of sites as we're going to delete any sites
-        # that have STATUS_SHUTDOWN within the resource_manager.drop_site() call
-        for site in self.sim.sites[:]:
+        # sites that have STATUS_SHUTDOWN are dropped all at once after the loop
+        shutdown_sites = []
+        for site in self.sim.sites:
             site_monitor = site.site_monitor
             site_id = site.id
 
-            self.tasks_in_per_site[site_id] = site_monitor.stats_Total_NTasksIn
-            self.tasks_started_per_site[site_id] = site_monitor.stats_Total_NTasksStarted
-            self.tasks_finished_per_site[site_id] = site_monitor.stats_Total_NTasksFinished
-            self.tasks_interrupted_per_site[site_id] = site_monitor.stats_Total_NInterrupted
-            self.consumed_CPU_time_per_site[site_id] = site_monitor.stats_Total_ConsumedCPUTime
-            self.running_consumed_CPU_time_per_site[site_id] = site_monitor.getRunningTasksConsumedTime()
-
-            self.sstats_Total_NTasksIn = sum(self.tasks_in_per_site.values())
-            self.sstats_Total_NTasksStarted = sum(self.tasks_started_per_site.values())
-            self.sstats_Total_NTasksFinished = sum(self.tasks_finished_per_site.values())
-            self.sstats_Total_NTasksInterrupted = sum(self.tasks_interrupted_per_site.values())
-            self.sstats_Total_ConsumedCPUTime = sum(self.consumed_CPU_time_per_site.values())
-            self.sstats_Total_RunningConsumedCPUTime = sum(self.running_consumed_CPU_time_per_site.values())
+            # the totals also cover dropped sites, whose last values stay in the per site dicts,
+            # so they are kept up to date by adding how much each site's value changed
+            self.sstats_Total_NTasksIn += self._update_site_stat(
+                self.tasks_in_per_site, site_id, site_monitor.stats_Total_NTasksIn)
+            self.sstats_Total_NTasksStarted += self._update_site_stat(
+                self.tasks_started_per_site, site_id, site_monitor.stats_Total_NTasksStarted)
+            self.sstats_Total_NTasksFinished += self._update_site_stat(
+                self.tasks_finished_per_site, site_id, site_monitor.stats_Total_NTasksFinished)
+            self.sstats_Total_NTasksInterrupted += self._update_site_stat(
+                self.tasks_interrupted_per_site, site_id, site_monitor.stats_Total_NInterrupted)
+            self.sstats_Total_ConsumedCPUTime += self._update_site_stat(
+                self.consumed_CPU_time_per_site, site_id, site_monitor.stats_Total_ConsumedCPUTime)
+            self.sstats_Total_RunningConsumedCPUTime += self._update_site_stat(
+                self.running_consumed_CPU_time_per_site, site_id, site_monitor.getRunningTasksConsumedTime())
 
             if site.status == Constants.STATUS_SHUTDOWN:
-                self.sim.resource_manager.drop_site(site)
+                shutdown_sites.append(site)
+
+        if shutdown_sites:
+            self.sim.resource_manager.drop_sites(shutdown_sites)
 
         # Schedule the next update statistics event
         self.events.enqueue(
             SimCore.Event(self.sim.ts_now + self.N_TICKS_UPDATE_STATISTICS,
                           self.id,
                           self.id,
-                          {'type': Constants.SM2SMs_UPDATE_STATISTICS})
+                          UPDATE_STATISTICS_PARAMS)
         )
 
     def evtMonitor(self, params):
@@ -327,4 +352,4 @@ class SystemMonitor(SimCore.SimEntity):
         # schedule another view for over N_REPORT_TICKS
         self.events.enqueue(
             SimCore.Event(self.sim.ts_now + self.report_interval, self.id, self.id,
-                          {'type': Constants.SM2SMs_MONITOR}))
+                          MONITOR_PARAMS))
@@ -16,27 +16,28 @@ class ResourceManager(object):
         self.cluster_setup = sorted(cluster_setup, key=lambda cluster: cluster.NProcs)
 
         self.sites = []
+        self.max_site_resources = 0 # resources of the largest site in self.sites
+
+        # running totals over self.sites, updated whenever a site is provisioned, shut down or dropped
+        # and by the sites themselves when tasks arrive, start or finish
+        self.running_capacity = 0 # resources of the sites with STATUS_RUNNING
+        self.total_capacity = 0 # resources of all sites, running or shut down
+        self.running_used_resources = 0 # used resources of the sites with STATUS_RUNNING
+        self.sites_load = 0 # cpus of the tasks queued or running at any site
+
         self.start_all_available_sites()
 
     def get_current_capacity(self):
-        current_capacity = 0
-        for site in self.sites:
-            if site.status == Constants.STATUS_RUNNING:
-                current_capacity += site.resources
+        return self.running_capacity
 
-        return current_capacity
+    def get_idle_capacity(self):
+        return self.running_capacity - self.running_used_resources
 
     def get_maximum_capacity(self):
         if self.allow_duplicates:
             raise NotImplementedError
 
-        max_capacity = 0
-        for site in self.sites:
-            max_capacity += site.resources
-
-        max_capacity += sum(site.NProcs for site in self.get_available_sites())
-
-        return max_capacity
+        return self.total_capacity + sum(site.NProcs for site in self.get_available_sites())
 
     def get_available_sites(self):
         '''Sites from cluster_setup that can be started.'''
@@ -44,7 +45,7 @@ class ResourceManager(object):
         if self.allow_duplicates:
             return self.cluster_setup
 
-        running_sites_IDs = [site.name for site in self.sites]
+        running_sites_IDs = set(site.name for site in self.sites)
         return [site for site in self.cluster_setup if site.ClusterID not in running_sites_IDs]
 
     def start_all_available_sites(self):
@@ -109,6 +110,9 @@ class ResourceManager(object):
         )
 
         self.sites.append(new_site)
+        self.max_site_resources = max(self.max_site_resources, new_site.resources)
+        self.running_capacity += new_site.resources
+        self.total_capacity += new_site.resources
         self.simulator.central_queue.add_site_stats(new_site)
 
         self.logger.log_and_db('Starting site {0} with {1} NProcs'.format(site_name, site_info.NProcs))
@@ -129,7 +133,7 @@ class ResourceManager(object):
             elif site.is_idle() or force and (not found_smallest or found_smallest.resources > site.resources):
                 found_smallest = site
 
-        return self.stop_site(self.sites.index(found_smallest)) if found_smallest else 0
+        return self.stop_site(found_smallest) if found_smallest else 0
 
     def release_resources_best_effort(self, capacity, only_idle=True, fix_capacity=False):
         """
@@ -164,25 +168,46 @@ class ResourceManager(object):
                     continue
 
                 resources += site.resources
-                site.shutdown()
-                self.simulator.central_queue.remove_site_stats(site.id)
+                self._shutdown_site(site)
 
         return resources
 
-    def stop_site(self, site_index):
-        site = self.sites[site_index]
+    def stop_site(self, site):
         self.logger.log('Stopping site {0}, id {1} with {2} free resources'.format(site.name, site.id, site.free_resources))
 
         resources = site.resources
-        site.shutdown()
-        self.simulator.central_queue.remove_site_stats(site.id)
+        self._shutdown_site(site)
 
         return resources
 
+    def _shutdown_site(self, site):
+        if site.status == Constants.STATUS_RUNNING:
+            self.running_capacity -= site.resources
+            self.running_used_resources -= site.used_resources
+
+        site.shutdown()
+        self.simulator.central_queue.remove_site_stats(site.id)
+
     def drop_site(self, site):
-        self.logger.log('Dropping site {0}, id {1} with {2} free resources'.format(site.name, site.id, site.free_resources))
-        if site.status != Constants.STATUS_SHUTDOWN:
-            raise Exception('Only sites with shutdown status should be dropped')
+        self.drop_sites([site])
+
+    def drop_sites(self, sites):
+        """Drops shutdown sites with a single pass over self.sites, preserving the order of the remaining sites."""
+
+        for site in sites:
+            self.logger.log('Dropping site {0}, id {1} with {2} free resources'.format(site.name, site.id, site.free_resources))
+            if site.status != Constants.STATUS_SHUTDOWN:
+                raise Exception('Only sites with shutdown status should be dropped')
+
+        for site in sites:
+            self.simulator.entity_registry.remove_entity_by_id(site.id)
+
+            self.total_capacity -= site.resources
+
+        # self.sites is shared with the simulator and the autoscalers, so update it in place
+        dropped_site_ids = set(site.id for site in sites)
+        self.sites[:] = [site for site in self.sites if site.id not in dropped_site_ids]
 
-        self.simulator.entity_registry.remove_entity_by_id(site.id)
-        self.sites.remove(site)
+        # only dropping the largest site can lower the maximum
+        if any(site.resources == self.max_site_resources for site in sites):
+            self.max_site_resources = max(other.resources for other in self.sites) if self.sites else 0
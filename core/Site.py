@@ -1,10 +1,15 @@
+import heapq
 import os
+from collections import deque
 
 from core import SimCore, Constants
 from core.SimLogger import DBLogger
 from core.SimMonitors import SiteMonitor
 from utils import SimUtils
 
+MONITOR_PARAMS = {'type': Constants.S2Ss_MONITOR}
+TASK_DONE_PARAMS = {'type': Constants.S2Ss_TASK_DONE}
+
 
 class Site(SimCore.SimEntity):
     """
@@ -23,8 +28,14 @@ class Site(SimCore.SimEntity):
 
         self.resources = resources
         self.resource_speed = resource_speed
+        self.run_time_ticks = {}  # task runtime -> ticks it runs for at resource_speed
         self.used_resources = 0
-        self.task_queue = []
+        self.free_resources = resources  # kept equal to resources - used_resources
+        # FCFS starts queued tasks in arrival order and stops at the first one that does not fit,
+        # FCFS with backfilling lets narrower tasks that fit start ahead of it
+        self.backfill = self.config['site']['FCFS_BACKFILL']
+        self.task_queue = BackfillTaskQueue() if self.backfill else deque()
+        self.queued_cpus = 0  # cpus requested by the tasks in task_queue
 
         self.report_interval = self.config['site_monitor']['N_TICKS_BETWEEN_MONITORING']
 
@@ -41,6 +52,15 @@ class Site(SimCore.SimEntity):
         self.status = Constants.STATUS_RUNNING
 
         self.running_tasks = {}
+        self.running_task_index = 0  # key of the task most recently added to running_tasks
+        # keys of the running tasks per ts_end; each ts_end gets a single task done event
+        self.tasks_ending_at = {}
+
+        # idle expired leased sites suspend monitoring themselves until a new task arrives
+        self._monitor_suspended = False
+        self._ts_next_monitor = 0
+        # at most one monitor event is queued at a time, so the same instance is re-armed
+        self._monitor_event = SimCore.Event(0, self.id, self.id, MONITOR_PARAMS)
 
         self.site_monitor = SiteMonitor(self)
 
@@ -48,14 +68,6 @@ class Site(SimCore.SimEntity):
     def expired(self):
         return 0 <= self.expiration_ts <= self.sim.ts_now
 
-    @property
-    def free_resources(self):
-        return self.resources - self.used_resources
-
-    @free_resources.setter
-    def free_resources(self, value):
-        self.used_resources -= value
-
     def is_idle(self):
         """An idle site can be easily shutdown, it has no running task and no tasks to process."""
 
@@ -64,144 +76,218 @@ class Site(SimCore.SimEntity):
     def activate(self):
         """Schedule a monitoring event for time=NOW."""
 
-        self.events.enqueue(
-            SimCore.Event(
-                self.sim.ts_now,
-                self.id,
-                self.id,
-                {'type': Constants.S2Ss_MONITOR}
-            )
-        )
+        self._schedule_monitor(self.sim.ts_now)
+
+    def _schedule_monitor(self, ts):
+        self._monitor_suspended = False
+        self._ts_next_monitor = ts
+        self._monitor_event.ts_arrival = ts
+        self.events.enqueue(self._monitor_event)
 
     def dispatch(self, event):
         """Stop receiving events if it was shutdown."""
 
-        if self.status == Constants.STATUS_RUNNING:
+        if self.status != Constants.STATUS_RUNNING:
+            return
+
+        # sites receive most of the events, so the frequent types skip the generic validation and
+        # events_map lookup; the rest (and malformed events) take the SimEntity path
+        params = event.params
+        event_type = event.type
+        if event_type == Constants.S2Ss_TASK_DONE:
+            self.finish_task(params)
+        elif event_type == Constants.CQ2S_ADD_TASK:
+            self.add_task(params)
+        elif event_type == Constants.S2Ss_MONITOR:
+            self.monitor(params)
+        else:
             super(Site, self).dispatch(event)
 
     def monitor(self, params):
         self.site_monitor.run()
 
+        # -- nothing left to report until a new task arrives, see add_task
+        if self.leased_instance and self.expired and self.is_idle():
+            self._monitor_suspended = True
+            self._ts_next_monitor += self.report_interval
+            return
+
         # -- schedule another view for over N_TICKS_BETWEEN_MONITORING
-        self.events.enqueue(
-            SimCore.Event(
-                self.sim.ts_now + self.report_interval,
-                self.id,
-                self.id,
-                {'type': Constants.S2Ss_MONITOR}
-            )
-        )
+        self._schedule_monitor(self.sim.ts_now + self.report_interval)
 
     def add_task(self, params):
         """At the moment, tasks accepted no matter what."""
 
-        self.site_monitor.stats_Total_NTasksIn += 1
-        self.site_monitor.stats_LRTU_NTasksIn += 1
-        self.site_monitor.add_arrived_task(int(self.sim.ts_now))
+        site_monitor = self.site_monitor
+        ts_now = self.sim.ts_now
+
+        site_monitor.stats_Total_NTasksIn += 1
+        site_monitor.stats_LRTU_NTasksIn += 1
+        site_monitor.add_arrived_task(int(ts_now))
+
+        if self._monitor_suspended:
+            # -- resume monitoring at the first reporting tick that has not passed yet
+            missed_intervals = -(-(ts_now - self._ts_next_monitor) // self.report_interval)
+            self._schedule_monitor(self._ts_next_monitor + max(missed_intervals, 0) * self.report_interval)
 
         task = params['task']
+        cpus = task.cpus
         task.queue_at_site(self.id)
 
+        # the head of a non-empty queue did not fit at the last reschedule, so under FCFS a task queued
+        # behind it has to wait for the reschedule of a task departure
+        start_now = (self.backfill or not self.task_queue) and self.free_resources >= cpus
+
         self.task_queue.append(task)
+        self.queued_cpus += cpus
+        self.sim.resource_manager.sites_load += cpus
 
-        self.events.enqueue(
-            SimCore.Event(
-                self.sim.ts_now,
-                self.id,
-                self.id,
-                {'type': Constants.S2Ss_RESCHEDULE}
-            )
-        )
+        if start_now:
+            self.reschedule(None)
 
     def reschedule(self, params):
-        """Uses a FCFS policy."""
-
-        self.logger.log('Length of local task_queue is {0}'.format(len(self.task_queue)), 'debug')
-
-        while self.task_queue and self.task_queue[0].cpus <= self.free_resources:
-            self.site_monitor.stats_Total_NTasksStarted += 1
-            self.site_monitor.stats_LRTU_NTasksStarted += 1
-
-            task = self.task_queue.pop(0)
+        """Uses a FCFS policy, or FCFS with backfilling when the task queue is ordered by cpus."""
+
+        task_queue = self.task_queue
+        site_monitor = self.site_monitor
+        resource_manager = self.sim.resource_manager
+        resource_speed = self.resource_speed
+        run_time_ticks = self.run_time_ticks
+        ts_now = self.sim.ts_now
+        site_id = self.id
+        tasks_ending_at = self.tasks_ending_at
+        Event = SimCore.Event
+
+        log_debug = self.logger.enabled_for('debug')
+        if log_debug:
+            self.logger.log('Length of local task_queue is {0}'.format(len(task_queue)), 'debug')
+
+        # the task done events are enqueued together once the loop is done, and so are the counter updates
+        task_done_events = []
+        running_tasks = self.running_tasks
+        running_task_index = self.running_task_index
+        free_resources = self.free_resources
+        started_cpus = 0
+
+        while task_queue and task_queue[0].cpus <= free_resources:
+            task = task_queue.popleft()
+            cpus = task.cpus
 
             # allocate resource(s)
-            self.used_resources += task.cpus
+            free_resources -= cpus
+            started_cpus += cpus
+
+            # fixed processing duration (homogeneous processing speeds), rounded up to whole ticks
+            runtime = task.runtime
+            iRunTime = run_time_ticks.get(runtime)
+            if iRunTime is None:
+                iRunTime, remainder = divmod(runtime, resource_speed)
+                iRunTime = run_time_ticks[runtime] = int(iRunTime) + (remainder > 0)
+            ts_end = ts_now + iRunTime
+            task.run(ts_now, ts_end)
+
+            running_task_index += 1
+            running_tasks[running_task_index] = task
+
+            if log_debug:
+                self.logger.log('Task {0} of {1} started (duration={2}, ts_end={3})'.format(
+                    task.id, task.submission_site, runtime, ts_end), 'debug')
+
+            ending_tasks = tasks_ending_at.get(ts_end)
+            if ending_tasks is None:
+                tasks_ending_at[ts_end] = [running_task_index]
+                task_done_events.append(Event(ts_end, site_id, site_id, TASK_DONE_PARAMS))
+            else:
+                ending_tasks.append(running_task_index)
+
+        n_started = running_task_index - self.running_task_index
+        if not n_started:
+            return
 
-            # fixed processing duration (homogeneous processing speeds)
-            iRunTime = int(task.runtime / self.resource_speed)
-            if task.runtime > iRunTime * self.resource_speed:
-                iRunTime += 1
-            task.run(self.sim.ts_now, self.sim.ts_now + iRunTime)
+        self.running_task_index = running_task_index
+        site_monitor.stats_Total_NTasksStarted += n_started
+        site_monitor.stats_LRTU_NTasksStarted += n_started
 
-            self.running_tasks[self.site_monitor.stats_Total_NTasksStarted] = task
+        self.queued_cpus -= started_cpus
+        self.used_resources += started_cpus
+        self.free_resources = free_resources
+        resource_manager.running_used_resources += started_cpus
 
-            self.logger.log('Task {0} of {1} started (duration={2}, ts_end={3})'.format(
-                task.id, task.submission_site, task.runtime, task.ts_end), 'debug')
+        self.events.enqueue_many(task_done_events)
 
-            self.events.enqueue(
-                SimCore.Event(
-                    task.ts_end,
-                    self.id,
+    def finish_task(self, params):
+        """Finishes all the tasks of this site that end at ts_now."""
+
+        sim = self.sim
+        site_monitor = self.site_monitor
+        resource_manager = sim.resource_manager
+        running_tasks = self.running_tasks
+        ts_now = sim.ts_now
+        report_interval = self.report_interval
+        site_label = '%d/%s' % (self.id, self.name)
+        log_debug = self.logger.enabled_for('debug')
+        Event = SimCore.Event
+
+        # the task done events are enqueued, the task trace rows written and the used resources released
+        # together once the loop is done
+        task_done_events = []
+        finished_task_rows = []
+        finished_cpus = 0
+
+        for task_index in self.tasks_ending_at.pop(ts_now):
+            task = running_tasks.pop(task_index)
+
+            task.stop()
+
+            cpus = task.cpus
+            ts_start = task.ts_start
+
+            finished_cpus += cpus
+
+            # -- compute overall stats
+            site_monitor.stats_Total_NTasksFinished += 1
+            site_monitor.stats_Total_ConsumedCPUTime += (ts_now - ts_start) * cpus
+            # -- compute last reporting time interval (LRTU) stats
+            site_monitor.stats_LRTU_NTasksFinished += 1
+            site_monitor.stats_LRTU_ConsumedCPUTime += min(ts_now - ts_start, report_interval) * cpus
+
+            finished_task_rows.append((
+                task.submission_site, task.running_site, task.submission_site, task.ts_submit,
+                ts_start, task.ts_end, 0, cpus,
+                site_label
+            ))
+            if log_debug:
+                self.logger.log('Task {0} of {1} finished'.format(
+                    task.id, task.submission_site), 'debug')
+            # write task finished in task trace
+            # logger.db('JOB\t{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}'.format(
+            #    task.id, task.owner, task.site,
+            #    task.ts_submit, task.ts_start, task.ts_stop,
+            #    task.status, task.result))
+
+            # tell task owner the task was done
+            task_done_events.append(
+                Event(
+                    ts_now,
                     self.id,
+                    sim.central_queue.id,
                     {
-                        'type': Constants.S2Ss_TASK_DONE,
-                        'running_task_index': self.site_monitor.stats_Total_NTasksStarted
+                        'type': Constants.S2U_TASK_DONE,
+                        'task': task
                     }
                 )
             )
 
-    def finish_task(self, params):
-        task_index = params['running_task_index']
-        task = self.running_tasks[task_index]
-
-        task.stop()
-
-        self.used_resources -= task.cpus
-        del self.running_tasks[task_index]
-
-        # -- compute overall stats
-        self.site_monitor.stats_Total_NTasksFinished += 1
-        self.site_monitor.stats_Total_ConsumedCPUTime += (self.sim.ts_now - task.ts_start) * task.cpus
-        # -- compute last reporting time interval (LRTU) stats
-        self.site_monitor.stats_LRTU_NTasksFinished += 1
-        self.site_monitor.stats_LRTU_ConsumedCPUTime += min(self.sim.ts_now - task.ts_start,
-                                                            self.report_interval) * task.cpus
-
-        self.sim.DBTasksDoneTrace.addFinishedTask(
-            task.submission_site, task.running_site, task.submission_site, task.ts_submit,
-            task.ts_start, task.ts_end, 0, task.cpus,
-            '%d/%s' % (self.id, self.name)
-        )
-        self.logger.log('Task {0} of {1} finished'.format(
-            task.id, task.submission_site), 'debug')
-        # write task finished in task trace
-        # logger.db('JOB\t{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}'.format(
-        #    task.id, task.owner, task.site,
-        #    task.ts_submit, task.ts_start, task.ts_stop,
-        #    task.status, task.result))
-
-        # tell task owner the task was done
-        self.events.enqueue(
-            SimCore.Event(
-                self.sim.ts_now,
-                self.id,
-                self.sim.central_queue.id,
-                {
-                    'type': Constants.S2U_TASK_DONE,
-                    'task': task
-                }
-            )
-        )
-
-        # each task departure triggers a scheduling event
-        self.events.enqueue(
-            SimCore.Event(
-                self.sim.ts_now,
-                self.id,
-                self.id,
-                {'type': Constants.S2Ss_RESCHEDULE}
-            )
-        )
+        self.used_resources -= finished_cpus
+        self.free_resources += finished_cpus
+        resource_manager.running_used_resources -= finished_cpus
+        resource_manager.sites_load -= finished_cpus
+
+        sim.DBTasksDoneTrace.addFinishedTasks(finished_task_rows)
+        self.events.enqueue_many(task_done_events)
+
+        # task departures trigger a scheduling pass
+        self.reschedule(None)
 
     def shutdown(self):
         """Prepares site to be shutdown: transfers running and queued tasks back Central Queue."""
@@ -211,20 +297,57 @@ class Site(SimCore.SimEntity):
         if self.is_idle():
             return
 
-        for task in self.running_tasks.values():
-            task.interrupt()
-            self.site_monitor.stats_Total_NInterrupted += 1
-
-        self.sim.central_queue.extend_task_list(self.running_tasks.values())
+        interrupted_tasks = list(self.running_tasks.values())
+        self.site_monitor.stats_Total_NInterrupted += len(interrupted_tasks)
+        interrupted_tasks.extend(self.task_queue)
 
-        for task in self.task_queue:
+        for task in interrupted_tasks:
             task.interrupt()
 
-        self.sim.central_queue.extend_task_list(self.task_queue)
+        self.sim.central_queue.extend_task_list(interrupted_tasks)
+        self.sim.resource_manager.sites_load -= self.used_resources + self.queued_cpus
+
+        self.running_tasks.clear()
+        self.tasks_ending_at.clear()
+        self.task_queue.clear()
         self.used_resources = 0
+        self.free_resources = self.resources
+        self.queued_cpus = 0
 
     def __str__(self):
         return '{0}: {1}'.format(self.__class__, self.__dict__)
 
     def __repr__(self):
         return '<Site object id={0}>'.format(self.id)
+
+
+class BackfillTaskQueue(object):
+    """
+    Site task queue ordered by (cpus, arrival), so its head is the narrowest task that arrived first.
+    Supports the part of the deque interface used by Site.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._arrival_index = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        return (task for _, _, task in sorted(self._heap))
+
+    def __getitem__(self, index):
+        if index != 0:
+            raise IndexError('BackfillTaskQueue only supports access to its head')
+        return self._heap[0][2]
+
+    def append(self, task):
+        heapq.heappush(self._heap, (task.cpus, self._arrival_index, task))
+        self._arrival_index += 1
+
+    def popleft(self):
+        return heapq.heappop(self._heap)[2]
+
+    def clear(self):
+        del self._heap[:]
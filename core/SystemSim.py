@@ -47,11 +47,11 @@ Options:
 """
 
 import datetime
+import json
 import logging
 import os
-import pprint
 import sys
-import time
+from collections import defaultdict
 
 # This needs to be here, else it cannot find root level files when importing them.
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -61,7 +61,7 @@ from docopt import docopt
 import autoscalers
 import ProjectUtils
 import SimCore
-from core import Site, Constants
+from core import Site
 from core.CentralQueue import CentralQueue
 from core.SimLogger import DBStats, DBTaskTrace, DBLogger, setup_logging, cleanup_logging
 from core.SimMonitors import SystemMonitor
@@ -107,6 +107,9 @@ config_schema = '''
     TOKEN_MAX_CAPACITY           = integer(default=500)
     SERVER_SPEED                 = float(default=1.0)
 
+    [site]
+    FCFS_BACKFILL               = boolean(default=False)
+
     [site_monitor]
     N_TICKS_BETWEEN_MONITORING  = integer(default=1)
     AMOUNT_OF_DAYS_HISTORY      = integer(default=3)
@@ -140,28 +143,29 @@ class SystemSim(SimCore.CSimulation):
         super(SystemSim, self).__init__(config=self.config)
 
     def log_tasks_in(self, workflows, tasks):
-        workflows_in = os.path.join(SimUtils.get_output(self.config), 'workflows.in')
-        tasks_in = os.path.join(SimUtils.get_output(self.config), 'tasks.in')
+        workflows_in = os.path.join(self.output, 'workflows.in')
+        tasks_in = os.path.join(self.output, 'tasks.in')
 
+        # one line per workflow, in id order
         with open(workflows_in, 'w') as f:
-            pprint.pprint(workflows, stream=f)
+            for workflow_id in sorted(workflows):
+                f.write('{0}: {1!r}\n'.format(workflow_id, workflows[workflow_id]))
 
+        # one line per task: id, ts_submit, runtime, cpus, submission_site
         with open(tasks_in, 'w') as f:
-            pprint.pprint([str(task) for task in tasks], stream=f)
+            for task in tasks:
+                f.write('{0}\t{1}\t{2}\t{3}\t{4}\n'.format(
+                    task.id, task.ts_submit, task.runtime, task.cpus, task.submission_site))
 
         # [SubmitTime, TaskNumber, NCPUs, RunTime, SubmissionSite, True]
-        for task in tasks:
-            self.DBTasksInTrace.addFinishedTask(
-                task.submission_site,
-                0,
-                0,
-                task.ts_submit,
-                0,
-                task.runtime,
-                0,
-                task.cpus,
-                None
-            )
+        # add the rows one buffer at a time, so the trace never holds more
+        # than a buffer's worth of rows for large workloads
+        buffer_size = self.DBTasksInTrace.BufferSize
+        for start in xrange(0, len(tasks), buffer_size):
+            self.DBTasksInTrace.addFinishedTasks([
+                (task.submission_site, 0, 0, task.ts_submit, 0, task.runtime, 0, task.cpus, None)
+                for task in tasks[start:start + buffer_size]
+            ])
         self.logger.db('Saved %d tasks.' % (len(tasks)))
         self.DBTasksInTrace.flush()
 
@@ -182,7 +186,7 @@ class SystemSim(SimCore.CSimulation):
         self.forced_stop = False
         self.cycle_messages_count = {}
 
-        self.logger.log('\n{0}'.format(pprint.pformat(self.config.dict(), indent=2)))
+        self.logger.log('\n{0}'.format(json.dumps(self.config.dict(), indent=2, sort_keys=True, default=str)))
         simulation_config = self.config['simulation']
 
         # get names and number of sites
@@ -264,6 +268,16 @@ class SystemSim(SimCore.CSimulation):
         self.logger.log('init EndTimes  = {0}'.format(dt_end.strftime(SimUtils.DATE_FORMAT)))
         self.logger.log('init RunTime   = {0}'.format(dt_end - dt_start))
 
+    def log_task_counts(self):
+        """Logs the system-wide task counters as a single multi-line entry."""
+
+        self.logger.log_and_db('\n'.join([
+            'Sys: Tasks In      ={0}'.format(self.system_monitor.sstats_Total_NTasksIn),
+            'Sys: Tasks Started ={0}'.format(self.system_monitor.sstats_Total_NTasksStarted),
+            'Sys: Tasks Finished={0}'.format(self.system_monitor.sstats_Total_NTasksFinished),
+            'Sys: Tasks To Come ={0}'.format(self.system_monitor.getNTasksToCome()),
+        ]))
+
     def start(self, ts_end=100):
         dtMainStartTime = datetime.datetime.now()
         cycle_duration = AIStatistics.CStats(bIsNumeric=True, bKeepValues=False, bAutoComputeStats=True)
@@ -279,91 +293,74 @@ class SystemSim(SimCore.CSimulation):
         dtTSStartTime = datetime.datetime.now()
         cycle_index = 0
         # reset current cycle's message count
-        self.crt_cycle_messages_count = {}
+        crt_cycle_messages_count = self.crt_cycle_messages_count = defaultdict(int)
 
         # ['S2Ss_JOB_DONE', 'S2Ss_MONITOR', 'S2Ss_RESCHEDULE', 'S2U_JOB_DONE', 'U2S_ADD_JOB', 'U2Us_SEND_JOBS]
-        event_types = []
-        for event_type in self.sites[0].events_map:
-            event_types.append(event_type)
-        for event_type in self.central_queue.events_map:
-            event_types.append(event_type)
-        for event_type in self.system_monitor.events_map:
-            event_types.append(event_type)
+        # the reported event types never change during a run
+        event_types = tuple(self.sites[0].events_map) + \
+            tuple(self.central_queue.events_map) + \
+            tuple(self.system_monitor.events_map)
+        # every cycle reports a count for each of the event types, 0 if none was processed
+        zero_counts = dict.fromkeys(event_types, 0)
 
         if self.config['simulation']['LoggingEnabled']:
-            self.logger.log_and_db('Sys: Tasks In      ={0}'.format(self.system_monitor.sstats_Total_NTasksIn))
-            self.logger.log_and_db('Sys: Tasks Started ={0}'.format(self.system_monitor.sstats_Total_NTasksStarted))
-            self.logger.log_and_db('Sys: Tasks Finished={0}'.format(self.system_monitor.sstats_Total_NTasksFinished))
-            self.logger.log_and_db('Sys: Tasks To Come ={0}'.format(self.system_monitor.getNTasksToCome()))
-
-        def gen_task_scheduler_event():
-            return SimCore.Event(
-                self.ts_now,
-                self.scheduler.id,
-                self.scheduler.id,
-                {'type': Constants.CQ2S_SCHEDULER_AUTORESCHEDULE}
-            )
-
-        while not self.forced_stop and self.ts_now <= self.ts_end and self.events:
-            event = self.events.dequeue()
+            self.log_task_counts()
+
+        # the loop runs once per event, so bind what it uses on every iteration
+        events = self.events
+        dequeue = events.dequeue
+        dispatch = self.dispatch
+        logging_enabled = self.config['simulation']['LoggingEnabled']
+        log_debug = self.logger.enabled_for('debug')
+        # ... and what every cycle rollover uses
+        cycle_messages_count = self.cycle_messages_count
+        add_no_messages = self.DBStats.addNoMessagesBulk
+
+        while not self.forced_stop and events:
+            event = dequeue()
 
             # Do not parse the event if it's later than ts_end.
-            if event.ts_arrival > self.ts_end:
+            if event.ts_arrival > ts_end:
                 break
 
-            self.ts_now = event.ts_arrival
+            ts_now = self.ts_now = event.ts_arrival
 
-            if self.config['simulation']['LoggingEnabled']:
-                self.logger.log('Processing event {0}'.format(event), 'debug')
+            if log_debug:
+                self.logger.log('Processing event %s' % event, 'debug')
 
             # statistics
-            if 'type' in event.params:
-                event_type = event.params['type']
-            else:
+            event_type = event.type
+            if event_type is None:
                 event_type = 'unknown'
 
             # count this event in the stats
-            if event_type not in self.crt_cycle_messages_count: self.crt_cycle_messages_count[event_type] = 0
-            self.crt_cycle_messages_count[event_type] += 1
+            crt_cycle_messages_count[event_type] += 1
 
-            if last_ts_now is not None:
-                if self.ts_now < last_ts_now:
-                    cycle_index += 1
+            # most events share the tick of the previous one
+            if ts_now != last_ts_now and last_ts_now is not None:
+                cycle_index += 1
+                if ts_now < last_ts_now:
                     self.logger.log_and_db('HUH!? got next event before the last processed event!?', 'error')
-                if self.ts_now > last_ts_now:
-                    cycle_index += 1
-
+                else:
                     ## amod 2007-04-07: bug: self.cycle_messages_count[last_ts_now] might not include all self.event_types
-                    if last_ts_now not in self.cycle_messages_count:
-                        self.cycle_messages_count[last_ts_now] = self.crt_cycle_messages_count
-                        for event_type in event_types:
-                            if event_type not in self.cycle_messages_count[last_ts_now]:
-                                self.cycle_messages_count[last_ts_now][event_type] = 0
-                    else:
-                        for event_type in self.crt_cycle_messages_count:
-                            self.cycle_messages_count[last_ts_now][event_type] += self.crt_cycle_messages_count[
-                                event_type]
+                    cycle_counts = cycle_messages_count.get(last_ts_now)
+                    if cycle_counts is None:
+                        cycle_counts = cycle_messages_count[last_ts_now] = dict(zero_counts)
+                    for event_type, count in crt_cycle_messages_count.iteritems():
+                        cycle_counts[event_type] = cycle_counts.get(event_type, 0) + count
 
                     # XXX write stats in hpdc-3_messages_over_time_tmp.dat
                     # self.crt_cycle_messages_count -- logs all messages in this current cycle
-                    NoEvents = 0
-                    for event_type in self.crt_cycle_messages_count:
-                        NoEvents += self.crt_cycle_messages_count[event_type]
-                    for event_type in event_types:
-                        if event_type in self.crt_cycle_messages_count:
-                            if self.config['simulation']['LoggingEnabled']:
-                                self.DBStats.addNoMessages(self.ts_now, event_type,
-                                                           self.crt_cycle_messages_count[event_type])
-                        else:
-                            if self.config['simulation']['LoggingEnabled']:
-                                self.DBStats.addNoMessages(self.ts_now, event_type, 0)
+                    if logging_enabled:
+                        add_no_messages(
+                            ts_now, [(event_type, crt_cycle_messages_count[event_type]) for event_type in event_types])
                     # if cycle_index % 100 == 0: fout.flush()
 
                     # reset current cycle's message count
-                    self.crt_cycle_messages_count = {}
+                    crt_cycle_messages_count.clear()
 
                     if cycle_index % 10000 == 0:
-                        if self.config['simulation']['LoggingEnabled']:
+                        if logging_enabled:
                             self.logger.log('======')
                             dtTSEndTime = datetime.datetime.now()
                             self.logger.log('CYCLE {0} (TS={1}) StartTime= {2}'.format(
@@ -384,9 +381,8 @@ class SystemSim(SimCore.CSimulation):
                                 dtTSEndTime - dtTSStartTime
                             ))
 
-                            cycle = time.mktime(dtTSEndTime.timetuple()) - time.mktime(dtTSStartTime.timetuple())
+                            cycle = (dtTSEndTime - dtTSStartTime).total_seconds()
                             cycle_duration.addValue(cycle)
-                            dtMainEndTime = datetime.datetime.now()
 
                             self.logger.log(
                                 'CYCLE {0} (TS={1}) Last={2}\n\tStats for 10k cycles: Avg={3}s Min={4}s Max={5}s'.format(
@@ -398,27 +394,15 @@ class SystemSim(SimCore.CSimulation):
                                     cycle_duration.Max
                                 )
                             )
-                            self.logger.log('CYCLES TotalRunTime  = {0}'.format(dtMainEndTime - dtMainStartTime))
+                            self.logger.log('CYCLES TotalRunTime  = {0}'.format(dtTSEndTime - dtMainStartTime))
 
-                            self.logger.log_and_db('Sys: Tasks In      ={0}'.format(self.system_monitor.sstats_Total_NTasksIn))
-                            self.logger.log_and_db(
-                                'Sys: Tasks Started ={0}'.format(self.system_monitor.sstats_Total_NTasksStarted))
-                            self.logger.log_and_db(
-                                'Sys: Tasks Finished={0}'.format(self.system_monitor.sstats_Total_NTasksFinished))
-                            self.logger.log_and_db('Sys: Tasks To Come ={0}'.format(self.system_monitor.getNTasksToCome()))
+                            self.log_task_counts()
 
                             dtTSStartTime = dtTSEndTime
 
-            last_ts_now = self.ts_now
+            last_ts_now = ts_now
 
-            if self.ts_now > self.ts_end and self.config['simulation']['LoggingEnabled']:
-                self.logger.log_and_db(
-                    'Got an event with ts_arrival={0} > ts_end={1} --> ending simulation'.format(self.ts_now,
-                                                                                                 self.ts_end),
-                    'warning')
-                break
-
-            self.dispatch(event)
+            dispatch(event)
 
         if self.forced_stop and self.config['simulation']['LoggingEnabled']:
             self.logger.log_and_db('Was forced to stop!', 'warning')
@@ -438,11 +422,13 @@ class SystemSim(SimCore.CSimulation):
         self.system_monitor.refresh_sstats({})
 
         if self.config['simulation']['LoggingEnabled']:
-            self.logger.log_and_db('Sys: Tasks In         ={0}'.format(self.system_monitor.sstats_Total_NTasksIn))
-            self.logger.log_and_db('Sys: Tasks Started    ={0}'.format(self.system_monitor.sstats_Total_NTasksStarted))
-            self.logger.log_and_db('Sys: Tasks Finished   ={0}'.format(self.system_monitor.sstats_Total_NTasksFinished))
-            self.logger.log_and_db('Sys: Tasks Interrupted={0}'.format(self.system_monitor.sstats_Total_NTasksInterrupted))
-            self.logger.log_and_db('Sys: Tasks To Come    ={0}'.format(self.system_monitor.getNTasksToCome()))
+            self.logger.log_and_db('\n'.join([
+                'Sys: Tasks In         ={0}'.format(self.system_monitor.sstats_Total_NTasksIn),
+                'Sys: Tasks Started    ={0}'.format(self.system_monitor.sstats_Total_NTasksStarted),
+                'Sys: Tasks Finished   ={0}'.format(self.system_monitor.sstats_Total_NTasksFinished),
+                'Sys: Tasks Interrupted={0}'.format(self.system_monitor.sstats_Total_NTasksInterrupted),
+                'Sys: Tasks To Come    ={0}'.format(self.system_monitor.getNTasksToCome()),
+            ]))
             self.logger.log('Sys: Tasks Too Large  ={0}'.format(self.system_monitor.count_tasks_too_large()))
 
     def report(self):
@@ -471,66 +457,28 @@ class SystemSim(SimCore.CSimulation):
                 self.logger.db('Simulated System Stats')
                 self.logger.db('=============================')
 
-        RptStats = {
-            'Site_Tasks_In': AIStatistics.CStats(bIsNumeric=True, bKeepValues=False, bAutoComputeStats=False),
-            'Site_Tasks_StartedPer': AIStatistics.CStats(bIsNumeric=True, bKeepValues=False, bAutoComputeStats=False),
-            'Site_Tasks_FinishedPer': AIStatistics.CStats(bIsNumeric=True, bKeepValues=False, bAutoComputeStats=False),
-            'CentralQueue_Tasks_Submitted': AIStatistics.CStats(bIsNumeric=True, bKeepValues=False,
-                                                               bAutoComputeStats=False),
-            'CentralQueue_Tasks_Finished': AIStatistics.CStats(bIsNumeric=True, bKeepValues=False,
-                                                              bAutoComputeStats=False),
-            'CentralQueue_Tasks_FinishedPer': AIStatistics.CStats(bIsNumeric=True, bKeepValues=False,
-                                                                 bAutoComputeStats=False)
-        }
-
-        for Site in self.sites:
-            site_monitor = Site.site_monitor
-            if self.config['simulation']['LoggingEnabled']:
+        # the per-site and central queue counters only go to the log
+        if self.config['simulation']['LoggingEnabled']:
+            for Site in self.sites:
+                site_monitor = Site.site_monitor
+                tasks_in = site_monitor.stats_Total_NTasksIn
                 self.logger.db('Site: {0}'.format(Site.name))
-                self.logger.db('Tasks: ' + '%8d' % site_monitor.stats_Total_NTasksIn + \
+                self.logger.db('Tasks: ' + '%8d' % tasks_in + \
                           '|' + '%8d' % site_monitor.stats_Total_NTasksStarted + '|' + '%8d' % site_monitor.stats_Total_NTasksFinished + '(In/S/F)')
                 self.logger.flush()
-            RptStats['Site_Tasks_In'].addValue(site_monitor.stats_Total_NTasksIn)
-            if site_monitor.stats_Total_NTasksIn > 0:
-                RptStats['Site_Tasks_StartedPer'].addValue(
-                    100.0 * site_monitor.stats_Total_NTasksStarted / site_monitor.stats_Total_NTasksIn)
-                RptStats['Site_Tasks_FinishedPer'].addValue(
-                    100.0 * site_monitor.stats_Total_NTasksFinished / site_monitor.stats_Total_NTasksIn)
-                if self.config['simulation']['LoggingEnabled']:
+                if tasks_in > 0:
                     self.logger.db(' [%]: ' + '%7s%%' % ('%.2f' % 100.0) + '|' + \
-                              '%7s%%' % ('%.2f' % (
-                                  100.0 * site_monitor.stats_Total_NTasksStarted / site_monitor.stats_Total_NTasksIn)) + '|' + \
-                              '%7s%%' % ('%.2f' % (
-                                  100.0 * site_monitor.stats_Total_NTasksFinished / site_monitor.stats_Total_NTasksIn)) + '(In/S/F)')
-            else:
-                # RptStats['Site_Tasks_StartedPer'].addValue( 0.0 )
-                # RptStats['Site_Tasks_FinishedPer'].addValue( 0.0 )
-                if self.config['simulation']['LoggingEnabled']:
+                              '%7s%%' % ('%.2f' % (100.0 * site_monitor.stats_Total_NTasksStarted / tasks_in)) + '|' + \
+                              '%7s%%' % ('%.2f' % (100.0 * site_monitor.stats_Total_NTasksFinished / tasks_in)) + '(In/S/F)')
+                else:
                     self.logger.db(' [%]: ' + '%8s' % 'n/a' + '|' + \
                               '%8s' % 'n/a' + '|' + \
                               '%8s%%' % 'n/a' + '(In/S/F)')
 
-        RptStats['CentralQueue_Tasks_Submitted'].addValue(self.central_queue.submitted_tasks_count)
-        RptStats['CentralQueue_Tasks_Finished'].addValue(self.central_queue.finished_tasks_count)
-        if self.central_queue.submitted_tasks_count > 0:
-            RptStats['CentralQueue_Tasks_FinishedPer'].addValue(
-                100.0 * self.central_queue.finished_tasks_count / self.central_queue.submitted_tasks_count)
-
-            if self.config['simulation']['LoggingEnabled']:
+            if self.central_queue.submitted_tasks_count > 0:
                 self.logger.db('Complete Stats')
                 self.logger.db('=============================')
                 self.logger.db('%s\t%s\t%s\t%s\t%s\t%s\t%s' % ('Name', 'NItems', 'Avg', 'Min', 'Max', 'Sum', 'CoV'))
-        for Stat in ['Site_Tasks_In',
-                     'Site_Tasks_StartedPer',
-                     'Site_Tasks_FinishedPer',
-                     'CentralQueue_Tasks_Submitted',
-                     'CentralQueue_Tasks_Finished',
-                     'CentralQueue_Tasks_FinishedPer']:
-            RptStats[Stat].doComputeStats()
-            # logger.db( "%s\t%s\t%s\t%s\t%s\t%s\t%s" % (
-            #     Stat, RptStats[Stat].NItems, "%.1f" % RptStats[Stat].Avg,
-            #     "%.1f" % RptStats[Stat].Min, "%.1f" % RptStats[Stat].Max, "%.1f" % RptStats[Stat].Sum,
-            #     "%.1f" % RptStats[Stat].COV))
 
         if self.autoscaler:
             self.autoscaler.report_stats(self.ts_now, self.resource_manager.get_maximum_capacity())
@@ -10,6 +10,23 @@ class Task(object):
     status_count = 4
     STATUS_SUBMITTED, STATUS_QUEUED, STATUS_RUNNING, STATUS_FINISHED = range(status_count)
 
+    __slots__ = (
+        'id',
+        'ts_submit',
+        'submission_site',
+        'runtime',
+        'cpus',
+        'dependencies',
+        'parents',
+        'children',
+        'requirements',
+        'status',
+        'running_site',
+        'ts_start',
+        'ts_end',
+        'workflow_id',
+    )
+
     def __init__(self, id, ts_submit, submission_site, runtime, cpus, dependencies, workflow_id=None, requirements=None):
         self.id = id
         self.ts_submit = ts_submit
@@ -27,21 +44,6 @@ class Task(object):
         self.ts_end = -1
         self.workflow_id = workflow_id
 
-    # def __setattr__(self, name, value):
-    #     err_msg = None
-    #     if name == 'status' and value not in range(self.status_count):
-    #         err_msg = 'Invalid range for task status: {0}'.format(value)
-    #     elif name in {'ts_submit', 'submission_site', 'runtime', 'cpus', 'running_site', 'ts_start', 'ts_end'} and \
-    #         not isinstance(value, int):
-    #         err_msg = 'Expected {0} to be of type int, instead got {1}'.format(name, value)
-    #     elif name == 'dependencies' and not all(isinstance(dependency, int) for dependency in value):
-    #         err_msg = 'Expected {0} to be of type int, instead got {1}'.format(name, value)
-    #
-    #     if err_msg:
-    #         raise ValueError(err_msg)
-    #
-    #     super(Task, self).__setattr__(name, value)
-
     def queue_at_site(self, site):
         """Called when the task gets added to a site's queue."""
 
@@ -71,7 +73,7 @@ class Task(object):
         self.status = Task.STATUS_FINISHED
 
     def __str__(self):
-        return '{0}: {1}'.format(self.__class__, self.__dict__)
+        return '{0}: {1}'.format(self.__class__, dict((name, getattr(self, name)) for name in self.__slots__))
 
     def __repr__(self):
         return 'Task {0}'.format(self.id)
@@ -11,6 +11,19 @@ class Workflow(object):
     STATUS_SUBMITTED = 0
     STATUS_STARTED = 1
     STATUS_FINISHED = 2
+
+    __slots__ = (
+        'id',
+        'ts_submit',
+        'tasks',
+        'critical_path_length',
+        'critical_path_task_count',
+        'ts_start',
+        'ts_finish',
+        'status',
+        '_unfinished_exit_tasks',
+    )
+
     def __init__(self, id, ts_submit, tasks):
         self.id = id
         self.ts_submit = ts_submit
@@ -22,6 +35,10 @@ class Workflow(object):
         self.ts_finish = -1
         self.status = Workflow.STATUS_SUBMITTED
 
+        # Exit tasks not yet seen finished, collected on the first completion
+        # check (tasks and their children are only known by then)
+        self._unfinished_exit_tasks = None
+
     def workflow_started(self):
         return self.status != Workflow.STATUS_SUBMITTED
 
@@ -36,15 +53,21 @@ class Workflow(object):
         if self.status == Workflow.STATUS_FINISHED:
             return True
         
-        # Loop over all tasks which have no children, those are exit tasks.
-        for task in [task for task in self.tasks if not task.children]:
-            if task.status != Task.STATUS_FINISHED:
-                return False
+        # Tasks which have no children are exit tasks. Finished tasks stay
+        # finished, so each of them only needs to be seen finished once.
+        exit_tasks = self._unfinished_exit_tasks
+        if exit_tasks is None:
+            exit_tasks = self._unfinished_exit_tasks = [task for task in reversed(self.tasks) if not task.children]
+
+        while exit_tasks and exit_tasks[-1].status == Task.STATUS_FINISHED:
+            exit_tasks.pop()
+        if exit_tasks:
+            return False
         self.status = Workflow.STATUS_FINISHED
         return True
 
     def __str__(self):
-        return '{0}: {1}'.format(self.__class__, self.__dict__)
+        return '{0}: {1}'.format(self.__class__, dict((name, getattr(self, name)) for name in self.__slots__))
 
     def __repr__(self):
-        return '{0}: {1}'.format(self.__class__, self.__dict__)
+        return '{0}: {1}'.format(self.__class__, dict((name, getattr(self, name)) for name in self.__slots__))
@@ -1,14 +1,14 @@
 #!/usr/bin/env python2.7
 
 import logging
-import os
+import subprocess
 import sys
 
 from core.SimLogger import setup_logging
 
 
-def run_script(script):
-    os.system("python experiments/ccgrid_2018/{0}".format(script))
+def start_script(script):
+    return subprocess.Popen([sys.executable, "experiments/ccgrid_2018/{0}".format(script)])
 
 
 if __name__ == "__main__":
@@ -21,5 +21,8 @@ if __name__ == "__main__":
         "scale_experiment.py"
     ]
 
-    for script in scripts:
-        run_script(script)
+    # the experiments are independent, so run them side by side
+    processes = [start_script(script) for script in scripts]
+    return_codes = [process.wait() for process in processes]
+
+    sys.exit(1 if any(return_codes) else 0)
@@ -5,6 +5,8 @@ from core.SimLogger import DBLogger
 
 from utils import SimUtils
 
+AUTORESCHEDULE_PARAMS = {'type': Constants.CQ2S_SCHEDULER_AUTORESCHEDULE}
+
 
 class Scheduler(SimCore.SimEntity):
 
@@ -33,8 +35,34 @@ class Scheduler(SimCore.SimEntity):
         """
         raise NotImplementedError("The base class auto_reschedule function should be overridden.")
 
+    def schedule_next_wakeup(self):
+        """Enqueue the next auto reschedule event, if any tasks are left to schedule."""
+
+        # If no more tasks to assign, no need to schedule a future event for this component
+        if not self.central_queue.has_remaining_tasks:
+            return
+
+        # Get the timestamp of the next task to be scheduled
+        next_task_ts = self.central_queue.ts_of_next_task
+
+        # Compute the timestamp of the next scheduling event, at least
+        # N_TICKS_BETWEEN_AUTO_RESCHEDULE in the future
+        if next_task_ts <= self.sim.ts_now + self.N_TICKS_BETWEEN_AUTO_RESCHEDULE:
+            next_event_ts = self.sim.ts_now + self.N_TICKS_BETWEEN_AUTO_RESCHEDULE
+        else:
+            next_event_ts = next_task_ts
+
+        self.events.enqueue(
+            SimCore.Event(
+                next_event_ts,
+                self.id,
+                self.id,
+                AUTORESCHEDULE_PARAMS
+            )
+        )
+
     def activate(self):
         self.events.enqueue(
-            SimCore.Event(self.sim.ts_now, self.id, self.id, {'type': Constants.CQ2S_SCHEDULER_AUTORESCHEDULE})
+            SimCore.Event(self.sim.ts_now, self.id, self.id, AUTORESCHEDULE_PARAMS)
         )
 
@@ -2,12 +2,12 @@ from schedulers.BestFitScheduler import BestFitScheduler
 from schedulers.FillWorstFitScheduler import FillWorstFitScheduler
 from schedulers.WorstFitScheduler import WorstFitScheduler
 
+SCHEDULERS = {
+    'fillworstfit': FillWorstFitScheduler,
+    'bestfit' : BestFitScheduler,
+    'worstfit' : WorstFitScheduler,
+}
 
-def get_scheduler_by_name(name):
-    map = {
-        'fillworstfit': FillWorstFitScheduler,
-        'bestfit' : BestFitScheduler,
-        'worstfit' : WorstFitScheduler,
-    }
 
-    return map[name] if name in map else None
+def get_scheduler_by_name(name):
+    return SCHEDULERS.get(name)
@@ -53,7 +53,7 @@ class TestKoalaSC(BaseTest):
         self.assertEqual(site.resources, 1)
         self.assertEqual(site.used_resources, 0)
         self.assertEqual(site.resource_speed, 2)
-        self.assertEqual(site.task_queue, [])
+        self.assertEqual(len(site.task_queue), 0)
         self.assertEqual(site.report_interval, 1)
         self.assertEqual(len(site.events_map), 4)
         self.assertEqual(len(site.running_tasks), 0)
@@ -87,3 +87,44 @@ class TestKoalaSC(BaseTest):
         site.activate()
         fakeQueue.enqueue.assert_called_once()
 
+
+    def test_idle_leased_site_suspends_monitoring(self):
+        fakeSimulator = MagicMock()
+        fakeSimulator.config = self.config
+        fakeSimulator.ts_now = 0
+        fakeSimulator.resource_manager.sites_load = 0
+        fakeSimulator.resource_manager.running_used_resources = 0
+        fakeQueue = MagicMock()
+        # the site re-arms a single monitor event, so record its timestamp at every enqueue
+        monitor_timestamps = []
+
+        def record_monitor_timestamp(event):
+            if event.params['type'] == Constants.S2Ss_MONITOR:
+                monitor_timestamps.append(event.ts_arrival)
+
+        fakeQueue.enqueue = MagicMock(name='enqueue', side_effect=record_monitor_timestamp)
+        fakeSimulator.events = fakeQueue
+        site = Site(fakeSimulator, "TestSite", 1, 1, leased_instance=True)
+        site.activate()
+        site.monitor({'type': Constants.S2Ss_MONITOR})
+        fakeQueue.enqueue.assert_called_once()
+
+        # a new task resumes monitoring at the next reporting tick
+        fakeSimulator.ts_now = 1
+        site.add_task({'type': Constants.CQ2S_ADD_TASK, 'task': Task("TestOwner", 1337, 0, 42, 1, [])})
+        self.assertEqual(monitor_timestamps, [0, site.report_interval])
+
+    def test_backfill_starts_narrow_task_behind_wide_head(self):
+        self.config['site']['FCFS_BACKFILL'] = True
+        fakeSimulator = MagicMock()
+        fakeSimulator.config = self.config
+        fakeSimulator.ts_now = 0
+        fakeSimulator.resource_manager.sites_load = 0
+        fakeSimulator.resource_manager.running_used_resources = 0
+        site = Site(fakeSimulator, "TestSite", 4, 1)
+
+        for task_id, cpus in (("Running", 2), ("Wide", 4), ("Narrow", 2)):
+            site.add_task({'type': Constants.CQ2S_ADD_TASK, 'task': Task(task_id, 1337, 0, 42, cpus, [])})
+
+        self.assertEqual(sorted(task.id for task in site.running_tasks.values()), ["Narrow", "Running"])
+        self.assertEqual([task.id for task in site.task_queue], ["Wide"])
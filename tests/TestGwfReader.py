@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from unittest import skipIf
+
+from tests.TestBase import BaseTest
+from utils import SimUtils
+
+GWF = """WorkflowID, JobID , SubmitTime , RunTime , NProcs , ReqNProcs , Dependencies
+0         , 0     , 0          , 1       , 1      , 1,
+0         , 1     , 0          , 1       , 1      , 1, 0
+0         , 2     , 2          , 3       , 2      , 2, 0 1
+"""
+
+ROWS = [
+    (0, 0, 0, 1, 1, []),
+    (0, 1, 0, 1, 1, [0]),
+    (0, 2, 2, 3, 2, [0, 1]),
+]
+
+
+class TestGwfReader(BaseTest):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.gwf_filename = os.path.join(self.folder, 'chain.gwf')
+        with open(self.gwf_filename, 'w') as gwf_file:
+            gwf_file.write(GWF)
+        os.utime(self.gwf_filename, (3600, 3600))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_rows(self):
+        self.assertEqual(list(SimUtils.rows_from_gwf(self.gwf_filename)), ROWS)
+
+    def test_unknown_dependency(self):
+        """
+        Task 1 depends on task 3, which is not in the file.
+        """
+        with open(self.gwf_filename, 'w') as gwf_file:
+            gwf_file.write(GWF.replace(', 0\n', ', 3\n'))
+
+        with self.assertRaises(ValueError):
+            SimUtils.read_tasks([SimUtils.ClusterInfo('c0', 'c0', 1)], [self.gwf_filename])
+
+    def test_sparse_job_ids(self):
+        """
+        Tasks without a workflow keep their JobIDs, task 1000000000 depends on task 7.
+        """
+        with open(self.gwf_filename, 'w') as gwf_file:
+            gwf_file.write(GWF.splitlines(True)[0] + ', 1000000000, 0, 1, 1, 1, 7\n, 7, 0, 1, 1, 1,\n')
+
+        workflows, tasks = SimUtils.read_tasks([SimUtils.ClusterInfo('c0', 'c0', 1)], [self.gwf_filename])
+
+        self.assertEqual([[parent.id for parent in task.parents] for task in tasks], [[7], []])
+
+    @skipIf(SimUtils.pyarrow is None, 'pyarrow is not available')
+    def test_parquet_round_trip(self):
+        """
+        Reading the file writes its Parquet copy, the next read comes from the copy and yields the same rows.
+        """
+        parquet_path = SimUtils.gwf_parquet_path(self.gwf_filename)
+
+        self.assertEqual(list(SimUtils.rows_from_gwf(self.gwf_filename)), ROWS)
+        self.check_file(parquet_path, should_exist=True)
+        self.assertEqual(list(SimUtils.rows_from_gwf(self.gwf_filename)), ROWS)
+
+    @skipIf(SimUtils.pyarrow is None, 'pyarrow is not available')
+    def test_partial_read_leaves_no_copy(self):
+        rows = SimUtils.rows_from_gwf(self.gwf_filename)
+        next(rows)
+        rows.close()
+
+        self.assertEqual(os.listdir(self.folder), ['chain.gwf'])
+
+    @skipIf(SimUtils.pyarrow is None, 'pyarrow is not available')
+    def test_parquet_copy_of_replaced_file(self):
+        """
+        The file is replaced by one of the same size with an older mtime (as cp -p would), so its copy is not used.
+        """
+        list(SimUtils.rows_from_gwf(self.gwf_filename))
+        with open(self.gwf_filename, 'w') as gwf_file:
+            gwf_file.write(GWF.replace(', 3       ,', ', 4       ,'))
+        os.utime(self.gwf_filename, (0, 0))
+
+        self.assertEqual(list(SimUtils.rows_from_gwf(self.gwf_filename))[2], (0, 2, 2, 4, 2, [0, 1]))
+
+    @skipIf(SimUtils.pyarrow is None, 'pyarrow is not available')
+    def test_corrupt_parquet_copy(self):
+        list(SimUtils.rows_from_gwf(self.gwf_filename))
+        with open(SimUtils.gwf_parquet_path(self.gwf_filename), 'r+b') as parquet_file:
+            parquet_file.truncate(16)
+
+        self.assertEqual(list(SimUtils.rows_from_gwf(self.gwf_filename)), ROWS)
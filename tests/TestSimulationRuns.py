@@ -5,6 +5,7 @@ provision policies!).
 THIS TEST ASSUMES THAT ENOUGH RESOURCES ARE AVAILABLE AT T=0 (I.E. ONE OR MORE BOOTED INSTANCES WITH ENOUGH RESOURCES),
 WE ARE NOT TESTING IF THE AUTOSCALING POLICIES SCALE CORRECTLY.
 """
+import multiprocessing
 import os.path
 
 import ProjectUtils
@@ -12,6 +13,47 @@ from core import SystemSim
 from tests.TestBase import BaseTest
 from utils import SimUtils
 
+WORKLOAD_HEADER = "WorkflowID, JobID, SubmitTime, RunTime, NProcs, ReqNProcs, Dependencies\n"
+WORKLOAD_ROW = "{0}, {1}, {2}, {3}, {4}, {5}, {6}\n"
+
+PROVISION_POLICIES = ["reg", "hist", "conpaas", "react", "token"]
+ALLOCATION_POLICIES = ["bestfit", "worstfit", "fillworstfit"]
+
+
+def run_simulation(args):
+    """
+    Run a single simulation; a module-level function so that it can run in a worker process. Returns what the tests
+    check of the finished simulation.
+    """
+    clustersetup_filename, provision_policy, allocation_policy, N_TICKS, config_overrides = args
+
+    config = SimUtils.generate_config(
+        N_TICKS=N_TICKS,
+        N_CLUSTERS=1,
+        config_schema=SystemSim.config_schema,
+    )
+
+    config['simulation']['Autoscaler'] = provision_policy
+    config['simulation']['Scheduler'] = allocation_policy
+    config['simulation']['ClusterSetup'] = clustersetup_filename
+    # Simulations running side by side each need their own output databases
+    config['experiment']['ID'] = 'test_{0}_{1}'.format(provision_policy, allocation_policy)
+
+    for section, values in config_overrides.items():
+        config[section].update(values)
+
+    system_sim = SystemSim.SystemSim(config=config)
+    system_sim.run()
+
+    return {
+        'provision_policy': provision_policy,
+        'allocation_policy': allocation_policy,
+        'ts_now': system_sim.ts_now,
+        'finished_tasks': system_sim.system_monitor.sstats_Total_NTasksFinished,
+        'queued_tasks': system_sim.central_queue.number_of_remaining_tasks,
+        'workflows': len(system_sim.central_queue.workflows),
+    }
+
 
 class TestSimulationRuns(BaseTest):
     def __init__(self, *args, **kwargs):
@@ -20,23 +62,42 @@ class TestSimulationRuns(BaseTest):
         # We need to create the file in the gwf folder since the Simulator checks there
         self.test_workload_filename = os.path.join(ProjectUtils.root_path, "gwf", "test_workload.gwf")
 
+    def write_workload(self, rows):
+        """Write the workload file in one go, from rows of WorkflowID, JobID, SubmitTime, RunTime, NProcs,
+        ReqNProcs and Dependencies."""
+        with open(self.test_workload_filename, "w") as test_workload_file:
+            test_workload_file.write(WORKLOAD_HEADER + "".join(WORKLOAD_ROW.format(*row) for row in rows))
+
+    def run_all_policies(self, N_TICKS, config_overrides=None):
+        """
+        Run the simulation for all combinations of provision policies and allocation policies. The runs are
+        independent, so they run in parallel, one per worker process.
+        """
+        args = [(self.test_clustersetup_filename, provision_policy, allocation_policy, N_TICKS, config_overrides or {})
+                for provision_policy in PROVISION_POLICIES
+                for allocation_policy in ALLOCATION_POLICIES]
+
+        return self.pool.map(run_simulation, args)
+
+    @classmethod
+    def setUpClass(cls):
+        # The worker processes are shared by all tests
+        cls.pool = multiprocessing.Pool()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        cls.pool.join()
+
     def setUp(self):
         # Check that the test files do not exist (dirty work environment check).
         self.check_file(self.test_clustersetup_filename, False)
         self.check_file(self.test_workload_filename, False)
 
-        self.test_setup_file = open(self.test_clustersetup_filename, "w")
-        self.test_workload_file = open(self.test_workload_filename, "w")
-
     def tearDown(self):
-        self.test_setup_file.close()
-        self.test_workload_file.close()
-
         # Delete the test file (clean up)
         os.remove(self.test_clustersetup_filename)
         os.remove(self.test_workload_filename)
-        self.check_file(self.test_clustersetup_filename, False)
-        self.check_file(self.test_workload_filename, False)
 
     def test_bot_same_submit_same_runtime(self):
         """
@@ -47,37 +108,13 @@ class TestSimulationRuns(BaseTest):
             test_setup_file.write("ClusterID, Cluster, Resource, Speed, Gwf\n")
             test_setup_file.write("test, test, 5, 1, {}\n".format(os.path.basename(self.test_workload_filename)))
 
-        with open(self.test_workload_filename, "w") as test_workload_file:
-            test_workload_file.write("WorkflowID, JobID, SubmitTime, RunTime, NProcs, ReqNProcs, Dependencies\n")
-            for i in xrange(5):
-                test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, i, 0, 5, 1, 1, ""))
-
-        # Check that files do exist now.
-        self.check_file(self.test_clustersetup_filename, True)
-        self.check_file(self.test_workload_filename, True)
-
-        provision_policies = ["reg", "hist", "conpaas", "react", "token"]
-        allocation_policies = ["bestfit", "worstfit", "fillworstfit"]
+        self.write_workload((0, i, 0, 5, 1, 1, "") for i in xrange(5))
 
         # Test all combinations of provision policies and allocation policies.
-        for provision_policy in provision_policies:
-            for allocation_policy in allocation_policies:
-                config = SimUtils.generate_config(
-                    N_TICKS=5,
-                    N_CLUSTERS=1,
-                    config_schema=SystemSim.config_schema,
-                )
-
-                config['simulation']['Autoscaler'] = provision_policy
-                config['simulation']['Scheduler'] = allocation_policy
-                config['simulation']['ClusterSetup'] = self.test_clustersetup_filename
-
-                system_sim = SystemSim.SystemSim(config=config)
-                system_sim.run()
-
-                self.assertEqual(system_sim.ts_now, 5)
-                self.assertEqual(system_sim.system_monitor.sstats_Total_NTasksFinished, 5)
-                self.assertEqual(len(system_sim.central_queue.task_queue), 0)
+        for result in self.run_all_policies(N_TICKS=5):
+            self.assertEqual(result['ts_now'], 5)
+            self.assertEqual(result['finished_tasks'], 5)
+            self.assertEqual(result['queued_tasks'], 0)
 
     def test_bot_same_submit_different_runtime(self):
         """
@@ -88,37 +125,13 @@ class TestSimulationRuns(BaseTest):
             test_setup_file.write("ClusterID, Cluster, Resource, Speed, Gwf\n")
             test_setup_file.write("test, test, 5, 1, {}\n".format(os.path.basename(self.test_workload_filename)))
 
-        with open(self.test_workload_filename, "w") as test_workload_file:
-            test_workload_file.write("WorkflowID, JobID, SubmitTime, RunTime, NProcs, ReqNProcs, Dependencies\n")
-            for i in xrange(5):
-                test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, i, i, 5, 1, 1, ""))
-
-        # Check that files do exist now.
-        self.check_file(self.test_clustersetup_filename, True)
-        self.check_file(self.test_workload_filename, True)
-
-        provision_policies = ["reg", "hist", "conpaas", "react", "token"]
-        allocation_policies = ["bestfit", "worstfit", "fillworstfit"]
+        self.write_workload((0, i, i, 5, 1, 1, "") for i in xrange(5))
 
         # Test all combinations of provision policies and allocation policies.
-        for provision_policy in provision_policies:
-            for allocation_policy in allocation_policies:
-                config = SimUtils.generate_config(
-                    N_TICKS=9,
-                    N_CLUSTERS=1,
-                    config_schema=SystemSim.config_schema,
-                )
-
-                config['simulation']['Autoscaler'] = provision_policy
-                config['simulation']['Scheduler'] = allocation_policy
-                config['simulation']['ClusterSetup'] = self.test_clustersetup_filename
-
-                system_sim = SystemSim.SystemSim(config=config)
-                system_sim.run()
-
-                self.assertEqual(system_sim.ts_now, 9)
-                self.assertEqual(system_sim.system_monitor.sstats_Total_NTasksFinished, 5)
-                self.assertEqual(len(system_sim.central_queue.task_queue), 0)
+        for result in self.run_all_policies(N_TICKS=9):
+            self.assertEqual(result['ts_now'], 9)
+            self.assertEqual(result['finished_tasks'], 5)
+            self.assertEqual(result['queued_tasks'], 0)
 
     def test_simple_workflow(self):
         """
@@ -134,45 +147,24 @@ class TestSimulationRuns(BaseTest):
             test_setup_file.write("ClusterID, Cluster, Resource, Speed, Gwf\n")
             test_setup_file.write("test, test, 2, 1, {}\n".format(os.path.basename(self.test_workload_filename)))
 
-        with open(self.test_workload_filename, "w") as test_workload_file:
-            test_workload_file.write("WorkflowID, JobID, SubmitTime, RunTime, NProcs, ReqNProcs, Dependencies\n")
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 0, 0, 5, 1, 1, ""))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 1, 0, 5, 1, 1, ""))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 2, 0, 5, 1, 1, "0 1"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 3, 0, 5, 1, 1, "2"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 4, 0, 5, 1, 1, "2"))
-
-        # Check that files do exist now.
-        self.check_file(self.test_clustersetup_filename, True)
-        self.check_file(self.test_workload_filename, True)
-
-        provision_policies = ["reg", "hist", "conpaas", "react", "token"]
-        allocation_policies = ["bestfit", "worstfit", "fillworstfit"]
+        self.write_workload([
+            (0, 0, 0, 5, 1, 1, ""),
+            (0, 1, 0, 5, 1, 1, ""),
+            (0, 2, 0, 5, 1, 1, "0 1"),
+            (0, 3, 0, 5, 1, 1, "2"),
+            (0, 4, 0, 5, 1, 1, "2"),
+        ])
 
         # Test all combinations of provision policies and allocation policies.
-        for provision_policy in provision_policies:
-            for allocation_policy in allocation_policies:
-                config = SimUtils.generate_config(
-                    N_TICKS=15,
-                    N_CLUSTERS=1,
-                    config_schema=SystemSim.config_schema,
-                )
-
-                config['simulation']['Autoscaler'] = provision_policy
-                config['simulation']['Scheduler'] = allocation_policy
-                config['simulation']['ClusterSetup'] = self.test_clustersetup_filename
-
-                system_sim = SystemSim.SystemSim(config=config)
-                system_sim.run()
-
-                self.assertEqual(system_sim.ts_now, 15)
-                self.assertEqual(system_sim.system_monitor.sstats_Total_NTasksFinished, 5,
-                                 "Expected {0} but was {1} for {2} and {3}".format(5,
-                                                                                   system_sim.system_monitor.sstats_Total_NTasksFinished,
-                                                                                   provision_policy,
-                                                                                   allocation_policy))
-                self.assertEqual(len(system_sim.central_queue.task_queue), 0)
-                self.assertEqual(len(system_sim.central_queue.workflows), 1)
+        for result in self.run_all_policies(N_TICKS=15):
+            self.assertEqual(result['ts_now'], 15)
+            self.assertEqual(result['finished_tasks'], 5,
+                             "Expected {0} but was {1} for {2} and {3}".format(5,
+                                                                               result['finished_tasks'],
+                                                                               result['provision_policy'],
+                                                                               result['allocation_policy']))
+            self.assertEqual(result['queued_tasks'], 0)
+            self.assertEqual(result['workflows'], 1)
 
     def test_more_complicated_workflow(self):
         """
@@ -197,50 +189,30 @@ class TestSimulationRuns(BaseTest):
             # situations.
             test_setup_file.write("test, test, 4, 1, {}\n".format(os.path.basename(self.test_workload_filename)))
 
-        with open(self.test_workload_filename, "w") as test_workload_file:
-            test_workload_file.write("WorkflowID, JobID, SubmitTime, RunTime, NProcs, ReqNProcs, Dependencies\n")
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 0, 0, 1, 1, 1, ""))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 1, 0, 2, 1, 1, "0"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 2, 0, 3, 1, 1, "1"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 3, 0, 3, 1, 1, "1"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 4, 0, 4, 1, 1, "2"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 5, 0, 4, 1, 1, "2"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 6, 0, 4, 1, 1, "3"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 7, 0, 4, 1, 1, "3"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 8, 0, 2, 1, 1, "4 5 6 7"))
-            test_workload_file.write("{0}, {1}, {2}, {3}, {4}, {5}, {6}\n".format(0, 9, 0, 1, 1, 1, "8"))
-
-        # Check that files do exist now.
-        self.check_file(self.test_clustersetup_filename, True)
-        self.check_file(self.test_workload_filename, True)
-
-        provision_policies = ["reg", "hist", "conpaas", "react", "token"]
-        allocation_policies = ["bestfit", "worstfit", "fillworstfit"]
+        self.write_workload([
+            (0, 0, 0, 1, 1, 1, ""),
+            (0, 1, 0, 2, 1, 1, "0"),
+            (0, 2, 0, 3, 1, 1, "1"),
+            (0, 3, 0, 3, 1, 1, "1"),
+            (0, 4, 0, 4, 1, 1, "2"),
+            (0, 5, 0, 4, 1, 1, "2"),
+            (0, 6, 0, 4, 1, 1, "3"),
+            (0, 7, 0, 4, 1, 1, "3"),
+            (0, 8, 0, 2, 1, 1, "4 5 6 7"),
+            (0, 9, 0, 1, 1, 1, "8"),
+        ])
 
         # Test all combinations of provision policies and allocation policies.
-        for provision_policy in provision_policies:
-            for allocation_policy in allocation_policies:
-                config = SimUtils.generate_config(
-                    N_TICKS=13,
-                    N_CLUSTERS=1,
-                    config_schema=SystemSim.config_schema,
-                )
-
-                config['simulation']['Autoscaler'] = provision_policy
-                config['simulation']['Scheduler'] = allocation_policy
-                config['simulation']['ClusterSetup'] = self.test_clustersetup_filename
-
-                config['autoscaler']['N_TICKS_PER_EVALUATE'] = 30
-                config['central_queue']['N_TICKS_MONITOR_SITE_STATUS'] = 1
-
-                system_sim = SystemSim.SystemSim(config=config)
-                system_sim.run()
-
-                self.assertEqual(system_sim.ts_now, 13)
-                self.assertEqual(system_sim.system_monitor.sstats_Total_NTasksFinished, 10,
-                                 "Expected {0} but was {1} for {2} and {3}".format(10,
-                                                                                   system_sim.system_monitor.sstats_Total_NTasksFinished,
-                                                                                   provision_policy,
-                                                                                   allocation_policy))
-                self.assertEqual(len(system_sim.central_queue.task_queue), 0)
-                self.assertEqual(len(system_sim.central_queue.workflows), 1)
+        for result in self.run_all_policies(N_TICKS=13, config_overrides={
+            'autoscaler': {'N_TICKS_PER_EVALUATE': 30},
+            'central_queue': {'N_TICKS_MONITOR_SITE_STATUS': 1},
+        }):
+            self.assertEqual(result['ts_now'], 13)
+            self.assertEqual(result['finished_tasks'], 10,
+                             "Expected {0} but was {1} for {2} and {3}".format(10,
+                                                                               result['finished_tasks'],
+                                                                               result['provision_policy'],
+                                                                               result['allocation_policy']))
+            self.assertEqual(result['queued_tasks'], 0)
+            self.assertEqual(result['workflows'], 1)
+
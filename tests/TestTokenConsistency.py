@@ -1,3 +1,4 @@
+import hashlib
 import os.path
 from unittest import skip
 
@@ -20,7 +21,6 @@ class TestTokenConsistency(BaseTest):
     def tearDown(self):
         self.test_clustersetup_file.close()
         os.remove(self.test_clustersetup_filename)
-        self.check_file(self.test_clustersetup_filename, False)
 
     @skip("This takes a lot of time, uncomment if changes are made to token or token_mod")
     def test_token_modified_behaviour(self):
@@ -29,8 +29,6 @@ class TestTokenConsistency(BaseTest):
             for i in xrange(50):
                 test_setup_file.write("test{0}, test{0}, 1, 1\n".format(i))
 
-        self.check_file(self.test_clustersetup_filename, True)
-
         provision_policies = ['token', 'token_mod']
         allocation_policies = ['bestfit', 'worstfit', 'fillworstfit']
 
@@ -49,9 +47,12 @@ class TestTokenConsistency(BaseTest):
                 system_sim = SystemSim.SystemSim(config=config)
                 system_sim.run()
 
-                with open(os.path.join(SimUtils.get_output(config), config['autoscaler']['OPS_FILENAME'])) as f:
-                    results[provision_policy] = f.read()
-                with open(os.path.join(SimUtils.get_output(config), config['autoscaler']['ELASTICITY_METRICS_FILENAME'])) as f:
-                    results[provision_policy] += f.read()
+                # Compare digests of the output files rather than their (large) contents
+                digest = hashlib.sha1()
+                for filename in (config['autoscaler']['OPS_FILENAME'], config['autoscaler']['ELASTICITY_METRICS_FILENAME']):
+                    with open(os.path.join(SimUtils.get_output(config), filename), 'rb') as f:
+                        for chunk in iter(lambda: f.read(1 << 16), b''):
+                            digest.update(chunk)
+                results[provision_policy] = digest.hexdigest()
 
             self.assertEqual(results['token'], results['token_mod'])
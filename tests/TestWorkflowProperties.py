@@ -1,7 +1,3 @@
-from StringIO import StringIO
-
-import pandas as pd
-
 from core.Task import Task
 from core.Workflow import Workflow
 from tests.TestBase import BaseTest
@@ -45,6 +41,41 @@ class TestWorkflowProerties(BaseTest):
         self.assertEquals(SimUtils.calculate_critical_path_length(workflow), 3)
         self.assertEquals(SimUtils.calculate_critical_path_length2(workflow), (3,2))
 
+    def test_cp_kept_on_workflow(self):
+        """
+        The critical path is computed once, after which it is read from the workflow.
+        """
+        task1 = Task(0, 0, 0, 1, 1, set(), 0)
+        task2 = Task(1, 0, 0, 1, 1, {0}, 0)
+
+        workflow = Workflow(0, 1, [task1, task2])
+
+        self.assertEquals(SimUtils.calculate_critical_path_length2(workflow), (2,2))
+        self.assertEquals((workflow.critical_path_length, workflow.critical_path_task_count), (2,2))
+
+        # changing the tasks requires resetting the stored critical path
+        task2.runtime = 2
+        self.assertEquals(SimUtils.calculate_critical_path_length(workflow), 2)
+        workflow.critical_path_length = workflow.critical_path_task_count = -1
+        self.assertEquals(SimUtils.calculate_critical_path_length(workflow), 3)
+        self.assertEquals(SimUtils.calculate_critical_path_length2(workflow), (3,2))
+
+    def test_unreleased_tasks_cp(self):
+        """
+        Tasks in a dependency cycle or depending on a task outside the workflow can't be placed on a path.
+        """
+        task1 = Task(0, 0, 0, 1, 1, {1}, 0)
+        task2 = Task(1, 0, 0, 1, 1, {0}, 0)
+
+        workflow = Workflow(0, 1, [task1, task2])
+        self.assertRaises(ValueError, SimUtils.calculate_critical_path_length2, workflow)
+
+        task1 = Task(0, 0, 0, 1, 1, set(), 0)
+        task2 = Task(1, 0, 0, 1, 1, {5}, 0)
+
+        workflow = Workflow(0, 1, [task1, task2])
+        self.assertRaises(ValueError, SimUtils.calculate_critical_path_length2, workflow)
+
     def test_complicated_workflow_cp(self):
         """
         Testing workflow 1885 from the Askalon EE trace.
@@ -82,12 +113,11 @@ class TestWorkflowProerties(BaseTest):
 1885      , 41309     , 1908      , 1672      , 1         , 1         ,           
 1885      , 41310     , 3592      , 0         , 1         , 1         ,           
 1885      , 41311     , 2761      , 21        , 1         , 1         , 41299 41293 41282 41281 41308 41304 41286 41283 41289 41288 41298 41287 41290 41295 41303'''
-        df = pd.read_csv(StringIO(snippet), delimiter="\s*,\s*",
-                         skipinitialspace=True, keep_default_na=False, header=None)
-
+        # The snippet has a fixed GWF layout, so plain splitting is enough to parse it
         tasks = []
-        for item in df.itertuples():
-            task = Task(item[2], item[3], 0, item[4], item[5], set(int(a) for a in item[7].split()), 0)
+        for line in snippet.strip().splitlines():
+            item = [field.strip() for field in line.split(',')]
+            task = Task(int(item[1]), int(item[2]), 0, int(item[3]), int(item[4]), set(int(a) for a in item[6].split()), 0)
             tasks.append(task)
 
         workflow = Workflow(0, 1885, tasks)
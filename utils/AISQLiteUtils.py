@@ -1,15 +1,28 @@
 import sqlite3
+from contextlib import contextmanager
 
 
 class CMySQLConnection:
     def __init__(self, DBName):
         self.connection = sqlite3.connect(DBName)
 
+        # the databases only hold simulation output, which a rerun rebuilds: keep the rollback
+        # journal in memory and do not wait for the disk to sync the buffered inserts
+        self.connection.execute("""PRAGMA journal_mode = MEMORY""")
+        self.connection.execute("""PRAGMA synchronous = OFF""")
+        self.connection.execute("""PRAGMA temp_store = MEMORY""")
+
     def getCursor(self):
         return self.connection.cursor()
 
     def commit(self):
         self.connection.commit()
 
+    @contextmanager
+    def bulk(self):
+        """Run the writes made in the block in a single transaction, committed once at its end."""
+        with self.connection:  # -- commits on success, rolls back on errors
+            yield self
+
     def close(self):
         self.connection.close()
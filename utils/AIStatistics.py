@@ -17,24 +17,39 @@ __license__ = "Python"
 # 21/03/2006 A.I. 0.1  Started this package
 # ---------------------------------------------------
 
+import array
 import math
 
+import numpy as np
+
 
 # import sys
 
-class CStats:
+class CStats(object):
     """ a class for quickly summarizing comparable (e.g., numeric) data """
 
+    # -- stats objects are updated once per value, so keep their fields in fixed slots
+    __slots__ = ('Min', 'Max', 'Sum', '_Mean', '_M2', '_Avg', '_StdDev', '_COV', '_bStatsStale', 'NItems', 'Values',
+                 'bIsNumeric', 'bKeepValues', 'bAutoComputeStats')
+
+    def __new__(cls, bIsNumeric=True, bKeepValues=True, bAutoComputeStats=True):
+        # -- numeric stats get the specialized (branch-free) addValue of CNumericStats
+        if cls is CStats and bIsNumeric: cls = CNumericStats
+        return super(CStats, cls).__new__(cls)
+
     def __init__(self, bIsNumeric=True, bKeepValues=True, bAutoComputeStats=True):
         self.Min = None
         self.Max = None
         self.Sum = 0
-        self.SumOfSquares = 0
-        self.Avg = None  # arithmetic mean
-        self.StdDev = None  # standard deviation
-        self.COV = None  # coefficient of variation
+        self._Mean = 0.0  # running mean and sum of squared deviations from it (Welford)
+        self._M2 = 0.0
+        self._Avg = None  # arithmetic mean
+        self._StdDev = None  # standard deviation
+        self._COV = None  # coefficient of variation
+        self._bStatsStale = False  # True while Avg/StdDev/COV lag behind the added values
         self.NItems = 0
-        self.Values = []
+        # -- numeric values are kept unboxed, as C doubles
+        self.Values = array.array('d') if bIsNumeric else []
         self.bIsNumeric = bIsNumeric
         self.bKeepValues = bKeepValues
         self.bAutoComputeStats = bAutoComputeStats
@@ -46,22 +61,21 @@ class CStats:
         if self.Max is None or self.Max < Value: self.Max = Value
         if self.bIsNumeric:
             self.Sum += Value
-            self.SumOfSquares += Value * Value
+            Delta = Value - self._Mean
+            self._Mean += Delta / float(self.NItems)
+            self._M2 += Delta * (Value - self._Mean)
+            # -- auto-computed stats are only computed when read, see Avg/StdDev/COV
             if self.bAutoComputeStats:
-                self.Avg = float(self.Sum) / self.NItems
-                if self.NItems - 1 > 0:
-                    self.StdDev = math.sqrt(
-                        (self.NItems * self.SumOfSquares - self.Sum * self.Sum) / (self.NItems * (self.NItems - 1)))
-                else:
-                    self.StdDev = 0.0
-                if abs(self.Avg) > 0.0001:
-                    self.COV = self.StdDev / self.Avg
-                else:
-                    self.COV = 0.0
+                self._bStatsStale = True
+
+    def addValues(self, Values):
+        for Value in Values:
+            self.addValue(Value)
 
     def doComputeStats(self):
+        self._bStatsStale = False
         if self.NItems > 0:
-            self.Avg = float(self.Sum) / self.NItems
+            self._Avg = float(self.Sum) / self.NItems
             # sys.stdout.write("-------------------\n")
             # sys.stdout.write("NItems =%30.3f\n" % (float(self.NItems)))
             # sys.stdout.write("Sum    =%30.3f\n" % (float(self.Sum)))
@@ -70,61 +84,128 @@ class CStats:
             # sys.stdout.write("N*SumSq=%30.3f\n" % (float(self.NItems * self.SumOfSquares)))
             # sys.stdout.write("Diff   =%30.3f\n" % (float(self.NItems * self.SumOfSquares - self.Sum * self.Sum)))
             # sys.stdout.flush()
+            # -- Welford's online variance, which does not cancel out like N*SumOfSquares - Sum^2 does
             if self.NItems - 1 > 0:
-                self.StdDev = math.sqrt(
-                    (self.NItems * self.SumOfSquares - self.Sum * self.Sum) / (self.NItems * (self.NItems - 1)))
+                self._StdDev = math.sqrt(self._M2 / (self.NItems - 1))
             else:
-                self.StdDev = 0.0
-            if abs(self.Avg) > 0.0001:
-                self.COV = self.StdDev / self.Avg
+                self._StdDev = 0.0
+            if abs(self._Avg) > 0.0001:
+                self._COV = self._StdDev / self._Avg
             else:
-                self.COV = 0.0
+                self._COV = 0.0
+
+    @property
+    def SumOfSquares(self):
+        return self._M2 + self._Mean * self._Mean * self.NItems
+
+    @property
+    def Avg(self):
+        if self._bStatsStale: self.doComputeStats()
+        return self._Avg
+
+    @property
+    def StdDev(self):
+        if self._bStatsStale: self.doComputeStats()
+        return self._StdDev
+
+    @property
+    def COV(self):
+        if self._bStatsStale: self.doComputeStats()
+        return self._COV
+
+
+class CNumericStats(CStats):
+    """ CStats for numeric data, specialized as such; created by CStats(bIsNumeric=True) """
+
+    __slots__ = ()
+
+    def addValue(self, Value):
+        NItems = self.NItems = self.NItems + 1
+        if self.bKeepValues: self.Values.append(Value)
+        if NItems == 1:
+            self.Min = self.Max = Value
+        elif self.Min > Value:
+            self.Min = Value
+        elif self.Max < Value:
+            self.Max = Value
+        self.Sum += Value
+        # -- _Mean is a float, so Delta is too
+        Mean = self._Mean
+        Delta = Value - Mean
+        self._Mean = Mean = Mean + Delta / NItems
+        self._M2 += Delta * (Value - Mean)
+        # -- auto-computed stats are only computed when read, see Avg/StdDev/COV
+        self._bStatsStale = self.bAutoComputeStats
+
+    def addValues(self, Values):
+        """ adds a sequence (or array) of values at once, reducing them in single NumPy passes """
+        Values = np.asarray(Values)
+        if not len(Values): return
+        NItemsBefore, NBatchItems = self.NItems, len(Values)
+        self.NItems += NBatchItems
+        if self.bKeepValues: self.Values.extend(Values.tolist())
+        BatchMin, BatchMax = Values.min().item(), Values.max().item()
+        if self.Min is None or self.Min > BatchMin: self.Min = BatchMin
+        if self.Max is None or self.Max < BatchMax: self.Max = BatchMax
+        self.Sum += Values.sum().item()
+        # -- merge the batch's mean and squared deviations into the running ones (Chan et al.)
+        BatchMean = Values.mean().item()
+        BatchDeviations = Values - BatchMean
+        Delta = BatchMean - self._Mean
+        self._Mean += Delta * NBatchItems / self.NItems
+        self._M2 += np.dot(BatchDeviations, BatchDeviations).item() + \
+            Delta * Delta * NItemsBefore * NBatchItems / self.NItems
+        self._bStatsStale = self.bAutoComputeStats
 
 
 class CWeightedStats(CStats):
     """ a class for quickly summarizing comparable (e.g., numeric) data """
 
+    __slots__ = ('WSum', 'WSumOfSquares', '_WAvg', '_AvgDev', 'TotalWeight', 'WValues', 'WMin', 'WMax')
+
     def __init__(self, bIsNumeric=True, bKeepValues=True, bAutoComputeStats=True):
         CStats.__init__(self, bIsNumeric, bKeepValues, bAutoComputeStats)
         self.WSum = 0  # sum of weighted values
         self.WSumOfSquares = 0  # sum of squares of weighted values
-        self.WAvg = None  # weighted average (Yahyapour,Lifka,...)
-        self.AvgDev = None  # weighted average deviation (Oliker)
+        self._WAvg = None  # weighted average (Yahyapour,Lifka,...)
+        self._AvgDev = None  # weighted average deviation (Oliker)
         self.TotalWeight = 0  # overall weight
-        self.WValues = []  # list of weighted values
+        self.WValues = array.array('d')  # list of weighted values
         self.WMin = None  # weighted min
         self.WMax = None  # weighted max
 
     def addValue(self, Value, Weight):
+        # -- also marks the (weighted) stats as stale, see WAvg/AvgDev
         CStats.addValue(self, Value)
         self.TotalWeight += Weight
-        if self.bKeepValues: self.Values.append(WeightedValue)
         if self.bIsNumeric:
             WeightedValue = Value * Weight
+            if self.bKeepValues: self.WValues.append(WeightedValue)
             if self.WMin is None or self.WMin > WeightedValue: self.WMin = WeightedValue
             if self.WMax is None or self.WMax < WeightedValue: self.WMax = WeightedValue
             self.WSum += WeightedValue
             self.WSumOfSquares += WeightedValue * WeightedValue
-            if self.bAutoComputeStats:
-                if self.TotalWeight > 0:
-                    self.WAvg = float(self.WSum) / self.TotalWeight
-                else:
-                    self.WAvg = 0.0
-                if self.NItems > 0:
-                    self.AvgDev = math.sqrt(self.SumOfSquares - self.Avg * self.Avg) / self.NItems
-                else:
-                    self.AvgDev = 0.0
 
     def doComputeStats(self):
         CStats.doComputeStats(self)
         if self.TotalWeight > 0:
-            self.WAvg = float(self.WSum) / self.TotalWeight
+            self._WAvg = float(self.WSum) / self.TotalWeight
         else:
-            self.WAvg = 0.0
+            self._WAvg = 0.0
         if self.NItems > 0:
-            self.AvgDev = math.sqrt(self.SumOfSquares - self.Avg * self.Avg) / self.NItems
+            self._AvgDev = math.sqrt(self.SumOfSquares - self.Avg * self.Avg) / self.NItems
         else:
-            self.AvgDev = 0.0
+            self._AvgDev = 0.0
+
+    @property
+    def WAvg(self):
+        if self._bStatsStale: self.doComputeStats()
+        return self._WAvg
+
+    @property
+    def AvgDev(self):
+        if self._bStatsStale: self.doComputeStats()
+        return self._AvgDev
 
 
 class CHistogram:
@@ -157,9 +238,11 @@ class CHistogram:
             self.Stats.doComputeStats()
             self.CDF = {}
             if self.NItems > 0:
-                Counter = 0
-                for Value in xrange(self.Stats.Min, self.Stats.Max + 1, StepSize):
-                    if Value in self.Values:
-                        Counter += self.Values[Value]
-                    self.CDF[Value] = float(Counter) / self.NItems
+                Min, Max = self.Stats.Min, self.Stats.Max
+                # -- dense counts over [Min, Max], of which every StepSize-th value is accumulated
+                Counts = np.zeros(Max - Min + 1, dtype=np.int64)
+                Counts[np.fromiter(self.Values.iterkeys(), dtype=np.int64, count=len(self.Values)) - Min] = \
+                    np.fromiter(self.Values.itervalues(), dtype=np.int64, count=len(self.Values))
+                CDFValues = np.cumsum(Counts[::StepSize]) / float(self.NItems)
+                self.CDF = dict(zip(xrange(Min, Max + 1, StepSize), CDFValues.tolist()))
         return self.CDF
@@ -38,6 +38,13 @@ MARKERS = [
     '.',
 ]
 
+USER_METRICS_DTYPES = {
+    'id': 'int64',
+    'makespan': 'float64',
+    'response_time': 'float64',
+    'critical_path': 'float64',
+}
+
 
 def load_from_autoscale_ops(autoscale_ops_file, ts_now_col=False, supply_col=False, demand_col=False,
                             pending_tasks_col=False):
@@ -55,15 +62,10 @@ def load_from_autoscale_ops(autoscale_ops_file, ts_now_col=False, supply_col=Fal
     if not columns_requested:
         return {}
 
-    df = pd.read_csv(autoscale_ops_file, names=header)
-
-    df = df.loc[0:, df.columns.isin(columns_requested)]
-    data = df.transpose().values.tolist()
+    # only the requested columns are parsed; each is returned as a NumPy array
+    df = pd.read_csv(autoscale_ops_file, names=header, usecols=columns_requested)
 
-    d = {}
-    for index, column in enumerate(columns_requested):
-        d[column] = data[index]
-    return d
+    return {column: df[column].to_numpy() for column in columns_requested}
 
 
 def load_from_user_metrics(user_metrics_file, id_col=False, makespan_col=False, response_time_col=False,
@@ -82,18 +84,16 @@ def load_from_user_metrics(user_metrics_file, id_col=False, makespan_col=False,
     if not columns_requested:
         return {}
 
-    df = pd.read_csv(user_metrics_file, names=header, delim_whitespace=True, skiprows=1)
-    df = df.loc[0:, df.columns.isin(columns_requested)]
-    data = df.transpose().values.tolist()
+    # a fixed dtype per column spares pandas the type inference; '\s+' is still handled by the C parser
+    df = pd.read_csv(user_metrics_file, names=header, sep=r'\s+', engine='c', skiprows=1,
+                     usecols=columns_requested, dtype=USER_METRICS_DTYPES)
 
-    d = {}
-    for index, column in enumerate(columns_requested):
-        d[column] = data[index]
+    d = {column: df[column].to_numpy() for column in columns_requested}
 
     # Compute the Normalized Schedule Length:
     if normalized_schedule_length:
-        critical_path = sum(d['critical_path'])
-        makespan = sum(d['makespan'])
+        critical_path = d['critical_path'].sum()
+        makespan = d['makespan'].sum()
 
         d['normalized_schedule_length'] = float(makespan) / float(critical_path)
 
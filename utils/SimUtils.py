@@ -1,15 +1,15 @@
 import csv
 import datetime
 import inspect
-import io
 import json
 import logging
+import multiprocessing
 import os
 import sys
-from operator import attrgetter
+import tempfile
+from collections import deque
 import pandas as pd
 
-import toposort
 from configobj import ConfigObj, flatten_errors, get_extra_values
 
 import ProjectUtils
@@ -17,14 +17,29 @@ from core.Task import Task
 from core.Workflow import Workflow
 from validate import Validator
 
+try:
+    import pyarrow  # only needed to keep Parquet copies of the GWF files
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 DATE_FORMAT = '%Y-%m-%d/%H:%M:%S'
 
 GWF_FOLDER = 'gwf'
 GWF_EXTENSION = '.gwf'
+GWF_COLUMNS = ('WorkflowID', 'JobID', 'SubmitTime', 'RunTime', 'NProcs', 'Dependencies')
+GWF_CHUNK_SIZE = 100000  # rows parsed at once
+GWF_PARQUET_EXTENSION = '.parquet'
+GWF_PARQUET_SOURCE_KEY = b'gwf_source'  # Parquet metadata key of the size and mtime of the GWF file
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+# Validator keeps no per-config state, so a single one (and its cache of parsed checks) is shared
+_validator = Validator()
+# parsed configspecs, keyed by the schema lines (or filename) they were parsed from
+_configspec_cache = {}
+
 
 def current_date_time():
     path_friendly_date_format = DATE_FORMAT.replace('/', '_')
@@ -34,11 +49,23 @@ def save_config(config):
      config.filename = os.path.join(get_output(config), 'config.ini')
      config.write()
 
+def get_configspec(config_schema):
+    """
+    Return the configspec parsed from config_schema, parsing every schema only once.
+    The configspec is only read when validating, so configs can share it.
+    """
+
+    key = tuple(config_schema) if isinstance(config_schema, list) else config_schema
+    configspec = _configspec_cache.get(key)
+    if configspec is None:
+        configspec = _configspec_cache[key] = ConfigObj(configspec=config_schema).configspec
+    return configspec
+
 def load_config(filename, config_schema):
     config = ConfigObj(
         filename,
         file_error=True,
-        configspec=config_schema
+        configspec=get_configspec(config_schema)
     )
 
     validate_config(config, config_schema)
@@ -60,7 +87,7 @@ def generate_config(N_TICKS, config_schema, ClusterSetup=None, N_CLUSTERS=None,
     if not N_TICKS or not config_schema:
         raise ValueError('Both N_TICKS and config_schema must be set')
 
-    config = ConfigObj(configspec = config_schema)
+    config = ConfigObj(configspec=get_configspec(config_schema))
     config['simulation'] = {
         'N_TICKS': N_TICKS,
     }
@@ -82,7 +109,7 @@ def validate_config(config, config_schema):
     # file (e.g: "Indices = 2,")
 
     # TODO: add validate steps that check there is at least on GWF value(either filename or clustername...)
-    result = config.validate(Validator(), preserve_errors=True)
+    result = config.validate(_validator, preserve_errors=True)
 
     err = flatten_errors(config, result)
     if err:
@@ -92,7 +119,7 @@ def validate_config(config, config_schema):
     # these settings won't be used
     extra_values = get_extra_values(config)
     if extra_values:
-        logger.debug('Not enforced by schema: %s' % extra_values)
+        logger.debug('Not enforced by schema: %s', extra_values)
 
 def get_output(config):
     experiment_config = config.get('experiment', {})
@@ -121,94 +148,97 @@ def read_cluster_setup(csv_filename):
     clusters = []
     gwf_filenames = []
     with open(csv_filename) as csvfile:
-        content = csvfile.read().replace(' ', '')
-        datastring = io.StringIO(unicode(content))
-        reader = csv.DictReader(datastring)
+        # the columns are padded with spaces
+        reader = csv.DictReader(csvfile, skipinitialspace=True)
+        reader.fieldnames = [column.strip() for column in reader.fieldnames]
         for row in reader:
             clusters.append(ClusterInfo(
-                row['ClusterID'],
-                row['Cluster'],
+                row['ClusterID'].strip(),
+                row['Cluster'].strip(),
                 int(row['Resource']),
                 float(row['Speed'])
                 )
             )
-            if row['Gwf']:
-                gwf_filenames.append(row['Gwf'])
+            gwf_filename = (row['Gwf'] or '').strip()
+            if gwf_filename:
+                gwf_filenames.append(gwf_filename)
 
     return (clusters, gwf_filenames)
 
 
 def calculate_critical_path_length(workflow):
-    id_dependencies_map = dict((task.id, task.dependencies) for task in workflow.tasks)
-    id_runtime_map = dict((task.id, task.runtime) for task in workflow.tasks)
-    id_submit_map = dict((task.id, task.ts_submit) for task in workflow.tasks)
-
-    sorted_ids = toposort.toposort(id_dependencies_map)
-
-    finish_times = {}
-    for ids in sorted_ids:
-        for _id in ids:
-            parents= id_dependencies_map[_id]
-            runtime = id_runtime_map[_id]
-            submit_time = id_submit_map[_id]
-            if parents:
-                critical_parent = max(finish_times[parent] for parent in parents)
-            else:
-                critical_parent = 0
+    """
+    Return the critical path length of the workflow, which is kept on the workflow once computed
+    (reset its critical_path_length to -1 after changing its tasks).
+    """
 
-            finish_time = max(critical_parent, submit_time) + runtime
-            finish_times[_id] = finish_time
+    if workflow.critical_path_length >= 0:
+        return workflow.critical_path_length
 
-    return max(finish_times.values()) - min(id_submit_map.values())
+    return calculate_critical_path_length2(workflow)[0]
 
 
 def calculate_critical_path_length2(workflow):
     """
     In addition to critical path length (aggregated runtimes of longest path in workflow),
-    also return the number of tasks of said path.
+    also return the number of tasks of said path. Both are kept on the workflow once computed
+    (reset its critical_path_task_count to -1 after changing its tasks).
     """
 
-    get_id_from_finish_time = lambda finish_time: finish_times.keys()[finish_times.values().index(finish_time)]
-
-    id_dependencies_map = dict((task.id, task.dependencies) for task in workflow.tasks)
-    id_runtime_map = dict((task.id, task.runtime) for task in workflow.tasks)
-    id_submit_map = dict((task.id, task.ts_submit) for task in workflow.tasks)
-    sorted_ids = toposort.toposort(id_dependencies_map)
+    if workflow.critical_path_task_count >= 0:
+        return (workflow.critical_path_length, workflow.critical_path_task_count)
+
+    # Kahn's algorithm: a task is walked once all of its dependencies are. The children are derived from the
+    # dependency ids, as task.children is only filled in by the trace readers
+    indegrees = {}
+    children = {}
+    ready = deque()
+    for task in workflow.tasks:
+        indegrees[task.id] = len(task.dependencies)
+        if not task.dependencies:
+            ready.append(task)
+        for dependency in task.dependencies:
+            children.setdefault(dependency, []).append(task)
 
     finish_times = {}
     path_lengths = {}
-    for ids in sorted_ids:
-        for _id in ids:
-            parents= id_dependencies_map[_id]
-            runtime = id_runtime_map[_id]
-            submit_time = id_submit_map[_id]
-
-            if parents:
-                critical_parent_finish_time = max(finish_times[parent] for parent in parents)
-                path_lengths[_id] = path_lengths[get_id_from_finish_time(critical_parent_finish_time)] + 1
-            else:
-                critical_parent_finish_time = 0
-                path_lengths[_id] = 1
-
-            finish_time = max(critical_parent_finish_time, submit_time) + runtime
-            finish_times[_id] = finish_time
+    last_id = None  # the task finishing last, ending the critical path
+    min_submit_time = None
+    while ready:
+        task = ready.popleft()
+        _id = task.id
+        parents = task.dependencies
+        submit_time = task.ts_submit
+
+        if parents:
+            critical_parent = max(parents, key=finish_times.__getitem__)
+            critical_parent_finish_time = finish_times[critical_parent]
+            path_lengths[_id] = path_lengths[critical_parent] + 1
+        else:
+            critical_parent_finish_time = 0
+            path_lengths[_id] = 1
+
+        finish_time = max(critical_parent_finish_time, submit_time) + task.runtime
+        finish_times[_id] = finish_time
+        if last_id is None or finish_time > finish_times[last_id]:
+            last_id = _id
+        if min_submit_time is None or submit_time < min_submit_time:
+            min_submit_time = submit_time
+
+        for child in children.get(_id, ()):
+            indegrees[child.id] -= 1
+            if not indegrees[child.id]:
+                ready.append(child)
+
+    # tasks that were never released are in a cycle or depend on a task outside the workflow
+    if len(finish_times) < len(workflow.tasks):
+        raise ValueError('Workflow {0} has {1} task(s) in a dependency cycle or depending on unknown tasks'.format(
+            workflow.id, len(workflow.tasks) - len(finish_times)))
+
+    workflow.critical_path_length = finish_times[last_id] - min_submit_time
+    workflow.critical_path_task_count = path_lengths[last_id]
+    return (workflow.critical_path_length, workflow.critical_path_task_count)
 
-    max_finish_time = max(finish_times.values())
-    task_count = path_lengths[get_id_from_finish_time(max_finish_time)]
-
-    return (max_finish_time - min(id_submit_map.values()), task_count)
-
-
-def create_from_gwf(row, submission_site, workflow_id=None):
-    return Task(
-        row['task_id'],
-        row['ts_submit'],
-        submission_site,
-        row['runtime'],
-        row['cpus'],
-        row['dependencies'],
-        workflow_id=workflow_id
-    )
 
 def create_from_wtf_parquet(row):
     return Task(
@@ -226,21 +256,35 @@ def read_tasks(clusters, gwf_filenames):
     workflows = {}
     tasks = []
 
+    # Only the parsing of the files is independent (the task and workflow ids depend on the
+    # files before), so with several files it's done up front by a pool of worker processes.
+    # Pool workers are daemonic and can't start workers themselves; they parse while reading.
+    parsed_files = None
+    distinct_gwf_filenames = sorted(set(gwf_filenames), key=gwf_filenames.index)
+    if len(distinct_gwf_filenames) > 1 and not multiprocessing.current_process().daemon:
+        pool = multiprocessing.Pool(min(len(distinct_gwf_filenames), multiprocessing.cpu_count()))
+        try:
+            parsed_files = dict(zip(distinct_gwf_filenames, pool.map(parse_gwf, distinct_gwf_filenames)))
+        finally:
+            pool.close()
+            pool.join()
+
     first_task_id = 0
     current_workflow_id = None
     prev_workflow_id_task_count = 0
     for index, gwf_filename in enumerate(gwf_filenames):
         prev_gwf_workflow_id = None
+        frames = parsed_files[gwf_filename] if parsed_files else frames_from_gwf(gwf_filename)
 
         cluster_id = index % len(clusters)
         cluster_tasks = []
-        tasks_by_id = {}
-        logger.debug('Cluster {0} uses {1}'.format(cluster_id, gwf_filename))
+        in_id_order = True
+        logger.debug('Cluster %s uses %s', cluster_id, gwf_filename)
 
-        for row in rows_from_gwf(gwf_filename):
-            if row['workflow_id'] != None:
-                if prev_gwf_workflow_id != row['workflow_id']:  # if True, we've reached a new workflow
-                    prev_gwf_workflow_id = row['workflow_id']
+        for gwf_workflow_id, task_id, ts_submit, runtime, cpus, dependencies in rows_from_frames(frames):
+            if gwf_workflow_id != None:
+                if prev_gwf_workflow_id != gwf_workflow_id:  # if True, we've reached a new workflow
+                    prev_gwf_workflow_id = gwf_workflow_id
 
                     # update current_workflow_id
                     if current_workflow_id == None:
@@ -253,37 +297,73 @@ def read_tasks(clusters, gwf_filenames):
 
                 prev_workflow_id_task_count += 1
 
-            row['task_id'] += first_task_id
-            row['dependencies'] = set(dependency + first_task_id for dependency in row['dependencies'])
-
-            task = create_from_gwf(row, cluster_id, current_workflow_id)
-            tasks_by_id[task.id] = task
-
+            # The dependencies stay a set: the central queue removes finished parents from it
+            if first_task_id:
+                dependencies = [dependency + first_task_id for dependency in dependencies]
+            task = Task(
+                task_id + first_task_id,
+                ts_submit,
+                cluster_id,
+                runtime,
+                cpus,
+                set(dependencies),
+                workflow_id=current_workflow_id
+            )
+            if not cluster_tasks:
+                base_id = task.id
+            elif task.id != base_id + len(cluster_tasks):
+                in_id_order = False
             cluster_tasks.append(task)
 
-        for task in cluster_tasks:
-            # append task to its workflow
+            # append task to its workflow, whose ts_submit is that of its first entry task
+            # (workflows can have multiple entry nodes)
             workflow_id = task.workflow_id
             if workflow_id is not None:
-                if workflow_id not in workflows:
-                    workflows[workflow_id] = Workflow(workflow_id, None, [])
-                workflows[workflow_id].tasks.append(task)
+                workflow = workflows.get(workflow_id)
+                if workflow is None:
+                    workflows[workflow_id] = Workflow(workflow_id, task.ts_submit, [task])
+                else:
+                    workflow.tasks.append(task)
+                    if task.ts_submit < workflow.ts_submit:
+                        workflow.ts_submit = task.ts_submit
+
+        # Task ids are consecutive within a workflow and shifted past the previous workflows, so the
+        # tasks of a file are found at their offset from the smallest id rather than through a dict.
+        # GWF files list their tasks by id, in which case that is their offset in cluster_tasks.
+        # Files without workflow ids keep their JobIDs, which can be sparse; those tasks are found through a dict.
+        tasks_by_offset = cluster_tasks
+        tasks_by_id = None
+        if not in_id_order:
+            base_id = min(task.id for task in cluster_tasks)
+            id_range = max(task.id for task in cluster_tasks) - base_id + 1
+            if id_range > 2 * len(cluster_tasks):
+                tasks_by_id = dict((task.id, task) for task in cluster_tasks)
+            else:
+                tasks_by_offset = [None] * id_range
+                for task in cluster_tasks:
+                    tasks_by_offset[task.id - base_id] = task
 
+        for task in cluster_tasks:
             for dependency in task.dependencies:
-                other_task = tasks_by_id[dependency]
-                other_task.children.append(task)
-                task.parents.append(other_task)
+                if tasks_by_id is not None:
+                    parent = tasks_by_id.get(dependency)
+                else:
+                    offset = dependency - base_id
+                    parent = tasks_by_offset[offset] if 0 <= offset < len(tasks_by_offset) else None
+                if parent is None:
+                    raise ValueError('Task {0} in {1} depends on unknown task {2}'.format(
+                        task.id, gwf_filename, dependency))
+                task.parents.append(parent)
+                parent.children.append(task)
 
         tasks.extend(cluster_tasks)
 
-        logger.info('Read {0} tasks for cluster {1}'.format(len(cluster_tasks), cluster_id))
+        logger.info('Read %d tasks for cluster %s', len(cluster_tasks), cluster_id)
 
-    # fill in ts_submit and critical_path_length for all workflows
+    # fill in critical_path_length for all workflows
     for workflow in workflows.values():
-        first_entry_task = min(workflow.tasks, key=attrgetter('ts_submit'))  # workflows can have multiple entry nodes
-        workflow.ts_submit = first_entry_task.ts_submit
         workflow.critical_path_length, workflow.critical_path_task_count = calculate_critical_path_length2(workflow)
-    logger.info('{0} workflows have been found'.format(len(workflows)))
+    logger.info('%d workflows have been found', len(workflows))
 
     return workflows, tasks
 
@@ -304,9 +384,13 @@ def read_tasks_from_wtf(path):
         tasks.append(task)
 
         workflow_id = task.workflow_id
-        if workflow_id not in workflows:
-            workflows[workflow_id] = Workflow(workflow_id, None, [])
-        workflows[workflow_id].tasks.append(task)
+        workflow = workflows.get(workflow_id)
+        if workflow is None:
+            workflows[workflow_id] = Workflow(workflow_id, task.ts_submit, [task])
+        else:
+            workflow.tasks.append(task)
+            if task.ts_submit < workflow.ts_submit:
+                workflow.ts_submit = task.ts_submit
 
     for task in tasks:
         for dependency in task.dependencies:
@@ -316,39 +400,209 @@ def read_tasks_from_wtf(path):
 
         tasks_read += 1
 
-    logger.info('Read {0} tasks'.format(tasks_read))
-    logger.info('{0} workflows have been found'.format(len(workflows)))
+    logger.info('Read %d tasks', tasks_read)
+    logger.info('%d workflows have been found', len(workflows))
 
 
 
-    # fill in ts_submit and critical_path_length for all workflows
+    # fill in critical_path_length for all workflows
     for workflow in workflows.values():
-        first_entry_task = min(workflow.tasks, key=attrgetter('ts_submit'))  # workflows can have multiple entry nodes
-        workflow.ts_submit = first_entry_task.ts_submit
         workflow.critical_path_length, workflow.critical_path_task_count = calculate_critical_path_length2(workflow)
 
     return workflows, tasks
 
 
 def rows_from_gwf(gwf_filename):
-    with open(gwf_filename, 'r') as gwf_file:
-        csv_reader = csv.DictReader(gwf_file)
-        for row in csv_reader:
-            row = dict((key.strip(), value.strip()) for key, value in row.items())
-            yield {
-                'workflow_id': int(row['WorkflowID']) if row['WorkflowID'] else None,
-                'task_id': int(row['JobID']),
-                'ts_submit': int(row['SubmitTime']),
-                'runtime': int(row['RunTime']),
-                'cpus': int(row['NProcs']),
-                'dependencies': set(int(dependency) for dependency in row['Dependencies'].split())
-            }
+    """
+    Yield a (workflow id, task id, ts_submit, runtime, cpus, dependencies) tuple per task in the GWF file.
+    The workflow id is None for tasks without one, the dependencies are a list of task ids.
+    """
+
+    return rows_from_frames(frames_from_gwf(gwf_filename))
+
+def rows_from_frames(frames):
+    """
+    Yield the rows_from_gwf tuples of GWF frames, as yielded by frames_from_gwf.
+    """
+
+    for frame in frames:
+        workflow_ids = frame['WorkflowID']
+        if workflow_ids.hasnans:  # tasks without a workflow
+            workflow_ids = [None if pd.isnull(workflow_id) else int(workflow_id) for workflow_id in workflow_ids]
+        else:
+            workflow_ids = workflow_ids.astype('int64').tolist()
+
+        columns = (
+            workflow_ids,
+            frame['JobID'].tolist(),
+            frame['SubmitTime'].tolist(),
+            frame['RunTime'].tolist(),
+            frame['NProcs'].tolist(),
+            frame['Dependencies'].tolist()
+        )
+        for row in zip(*columns):
+            yield row
+
+def frames_from_gwf(gwf_filename):
+    """
+    Yield the GWF_COLUMNS of the GWF file as DataFrames, with the dependencies as lists of ints.
+    These are read from the Parquet copy of the file when it was written from the file as it is now (same size and
+    mtime), otherwise the file is parsed and, if pyarrow is available, its Parquet copy is written once all of it
+    has been read.
+    """
+
+    parquet_path = gwf_parquet_path(gwf_filename)
+    source = gwf_source_stamp(gwf_filename)
+    if pyarrow and os.path.exists(parquet_path):
+        frames = read_gwf_parquet_copy(parquet_path, source)
+        if frames is not None:
+            for frame in frames:
+                yield frame
+            return
+
+    # GWF headers and fields are padded with spaces; the C parser skips the leading
+    # ones and tolerates the trailing ones in numbers, the names are stripped below
+    padded_columns = dict(
+        (column.strip(), column) for column in pd.read_csv(gwf_filename, nrows=0, skipinitialspace=True).columns
+    )
+    chunks = pd.read_csv(
+        gwf_filename,
+        usecols=[padded_columns[column] for column in GWF_COLUMNS],
+        dtype={padded_columns['Dependencies']: str},  # single dependencies would otherwise be parsed as floats
+        skipinitialspace=True,
+        chunksize=GWF_CHUNK_SIZE
+    )
+    # the copy is written chunk by chunk next to the file and only takes its place once the file has been read
+    parquet_copy = _GwfParquetCopy(parquet_path, source) if pyarrow else None
+    try:
+        for chunk in chunks:
+            chunk.columns = chunk.columns.str.strip()
+            chunk['WorkflowID'] = chunk['WorkflowID'].astype('float64')  # the same in every chunk (and the copy)
+            chunk['Dependencies'] = [
+                [int(dependency) for dependency in dependencies]
+                for dependencies in chunk['Dependencies'].fillna('').astype(str).str.split()
+            ]
+            if parquet_copy:
+                parquet_copy.write(chunk)
+            yield chunk
+        if parquet_copy:
+            parquet_copy.commit()
+    finally:
+        if parquet_copy:
+            parquet_copy.discard()
+
+def gwf_source_stamp(gwf_filename):
+    """
+    Returns the size and mtime of the GWF file, as kept in the metadata of its Parquet copy.
+    """
+
+    stat = os.stat(gwf_filename)
+    return '{0} {1!r}'.format(stat.st_size, stat.st_mtime)
+
+def read_gwf_parquet_copy(parquet_path, source):
+    """
+    Returns the frames of the Parquet copy, or None when it was written from another version of the GWF file
+    (see gwf_source_stamp) or can't be read, in which case the GWF file is parsed again.
+    """
+
+    try:
+        parquet_file = pyarrow.parquet.ParquetFile(parquet_path)
+        if (parquet_file.metadata.metadata or {}).get(GWF_PARQUET_SOURCE_KEY) != source.encode('utf-8'):
+            logger.debug('Parquet copy %s is out of date', parquet_path)
+            return None
+
+        frames = []
+        for row_group in range(parquet_file.num_row_groups):
+            frame = parquet_file.read_row_group(row_group, columns=list(GWF_COLUMNS)).to_pandas()
+            frame['Dependencies'] = [dependencies.tolist() for dependencies in frame['Dependencies']]  # from arrays
+            frames.append(frame)
+        return frames
+    except Exception:  # pyarrow raises its own errors next to IOError/OSError
+        logger.warning('Could not read the Parquet copy %s', parquet_path, exc_info=True)
+        return None
+
+class _GwfParquetCopy(object):
+    """
+    Writes the frames of a GWF file to its Parquet copy. The copy is a cache, so failing to write it is
+    logged and does not stop the file from being read.
+    """
+
+    def __init__(self, parquet_path, source):
+        self.parquet_path = parquet_path
+        self.partial_path = None
+        self.schema = pyarrow.schema([
+            ('WorkflowID', pyarrow.float64()),
+            ('JobID', pyarrow.int64()),
+            ('SubmitTime', pyarrow.int64()),
+            ('RunTime', pyarrow.int64()),
+            ('NProcs', pyarrow.int64()),
+            ('Dependencies', pyarrow.list_(pyarrow.int64())),
+        ], metadata={GWF_PARQUET_SOURCE_KEY: source.encode('utf-8')})
+        self.writer = None
+        self._guard(self._open)
+
+    def __nonzero__(self):
+        return self.writer is not None
+
+    def write(self, frame):
+        self._guard(lambda: self.writer.write_table(
+            pyarrow.Table.from_pandas(frame[list(GWF_COLUMNS)], schema=self.schema, preserve_index=False)
+        ))
+
+    def commit(self):
+        def _commit():
+            self.writer.close()
+            self.writer = None
+            os.rename(self.partial_path, self.parquet_path)
+            self.partial_path = None
+        self._guard(_commit)
+
+    def discard(self):
+        """Drops the partial copy, e.g. when the file was not read to its end."""
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.partial_path is not None:
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+            self.partial_path = None
+
+    def _open(self):
+        # every reader writes its own partial copy, as several processes may read the same file at once
+        partial_file, self.partial_path = tempfile.mkstemp(
+            prefix=os.path.basename(self.parquet_path) + '.',
+            dir=os.path.dirname(os.path.abspath(self.parquet_path))
+        )
+        os.close(partial_file)
+        self.writer = pyarrow.parquet.ParquetWriter(self.partial_path, self.schema, compression='snappy')
+
+    def _guard(self, action):
+        try:
+            action()
+        except Exception:  # pyarrow raises its own errors next to IOError/OSError
+            logger.warning('Could not write the Parquet copy %s', self.parquet_path, exc_info=True)
+            try:
+                self.discard()
+            except Exception:
+                self.writer = None
+
+def parse_gwf(gwf_filename):
+    """
+    Returns the frames_from_gwf of the GWF file as a list, to be sent back from a worker process.
+    """
+
+    return list(frames_from_gwf(gwf_filename))
 
 def prepend_gwf_path(gwf_filename):
     return os.path.join(ProjectUtils.root_path, GWF_FOLDER, gwf_filename)
 
+def gwf_parquet_path(gwf_filename):
+    return gwf_filename + GWF_PARQUET_EXTENSION
+
 def get_hour_and_day_for_ts(ts):
-    return int(ts / 3600) % 24, int(ts / (24 * 3600))
+    hours = int(ts) // 3600  # the day follows from the hours
+    return hours % 24, hours // 24
 
 def add_file_logging(name, filename, config):
     frame = inspect.stack()[1]
@@ -394,8 +648,9 @@ def get_gwf_files(file_or_folder):
     if os.path.isfile(file_or_folder) and file_or_folder.endswith(GWF_EXTENSION):
         files = [file_or_folder]
     else:
-        files = [os.path.join(file_or_folder, f) for f in os.listdir(file_or_folder)]
-        files = [f for f in files if os.path.isfile(f) and f.endswith(GWF_EXTENSION)]  # filter files
+        # check the extension first, so only the gwf entries cost a stat() call
+        files = [os.path.join(file_or_folder, f) for f in os.listdir(file_or_folder) if f.endswith(GWF_EXTENSION)]
+        files = [f for f in files if os.path.isfile(f)]  # filter dirs
         files.sort()
 
     return files
@@ -428,60 +683,86 @@ def subset_closest_to_sum(lst, target, key=lambda x: x, with_duplicates=False, g
     if not with_duplicates and sum(map(key, lst)) <= target:
         return lst
 
+    # Each reachable sum maps to the (last item, rest) link of its subset, so extending a subset
+    # shares the rest instead of copying it; only the returned subset is turned into a list.
     def _subset_with_sum(lst, target, gt=True):
-        reachable = {0: []}
+        reachable = {0: None}
 
         closest_sum = None
-        closest_lst = []
+        closest_subset = None
+        remaining = sum(map(key, lst))  # the most the current and later items can still add
         for item in lst:
-            for number in sorted(reachable.keys(), reverse=True):
-                result = key(item) + number
+            value = key(item)
+            # The sums are visited in decreasing order, so once a sum can no longer reach the target
+            # (gt) or exceed the closest sum (not gt), neither can the ones after it
+            lowest_useful = target - remaining if gt else None
+            for number in sorted(reachable, reverse=True):
+                if gt:
+                    if number < lowest_useful:
+                        break
+                elif closest_sum and number + remaining <= closest_sum:
+                    break
+
+                result = value + number
 
                 if result > target:
                     if gt and (not closest_sum or result < closest_sum):
                         closest_sum = result
-                        closest_lst = reachable[number] + [item]
+                        closest_subset = (item, reachable[number])
                     continue
                 elif result == target:
-                    return reachable[number] + [item]
+                    return _linked_items((item, reachable[number]))
                 else:
                     if not gt and (not closest_sum or result > closest_sum):
                         closest_sum = result
-                        closest_lst = reachable[number] + [item]
-                    reachable[result] = reachable[number] + [item]
+                        closest_subset = (item, reachable[number])
+                    reachable[result] = (item, reachable[number])
+            remaining -= value
 
-        return closest_lst
+        return _linked_items(closest_subset)
 
     def _subset_with_sum_with_duplicates(lst, target):
-        reachable = {0: []}
+        reachable = {0: None}
+        lengths = {0: 0}
         added_something = True
         closest_sum = None
-        closest_lst = []
+        closest_subset = None
 
+        items = [(item, key(item)) for item in sorted(lst, key=key, reverse=True)]
         while added_something:
             added_something = False
-            for number in sorted(reachable.keys(), reverse=True):
-                for item in sorted(lst, key=key, reverse=True):
-                    result = key(item) + number
+            for number in sorted(reachable, reverse=True):
+                for item, value in items:
+                    result = value + number
 
                     if result > target:
                         if not closest_sum or result < closest_sum:
                             closest_sum = result
-                            closest_lst = reachable[number] + [item]
+                            closest_subset = (item, reachable[number])
 
                         continue
                     else:
-                        if result not in reachable:
+                        if result not in reachable or lengths[number] + 1 < lengths[result]:
                             added_something = True
-                            reachable[result] = reachable[number] + [item]
-                        elif len(reachable[number]) + 1 <  len(reachable[result]):
-                            added_something = True
-                            reachable[result] = reachable[number] + [item]
-        return closest_lst if target not in reachable else reachable[target]
+                            reachable[result] = (item, reachable[number])
+                            lengths[result] = lengths[number] + 1
+        return _linked_items(closest_subset if target not in reachable else reachable[target])
 
     return _subset_with_sum(lst, target, gt) if not with_duplicates \
         else _subset_with_sum_with_duplicates(lst, target)
 
+def _linked_items(subset):
+    """
+    Returns the items of a subset built from (item, rest) links, in the order they were added.
+    """
+
+    items = []
+    while subset is not None:
+        item, subset = subset
+        items.append(item)
+    items.reverse()
+    return items
+
 def subset_closest_to_sum2(lst, target, key=lambda x: x, key2=lambda x: x):
     """
     Similar to subset_closest_to_sum but uses key2 func to choose between two equal sets.
@@ -495,33 +776,46 @@ def subset_closest_to_sum2(lst, target, key=lambda x: x, key2=lambda x: x):
         [(2, 3), (2, 1), (2, 3), (2, 0)]
     """
 
-    def _sum(lst):
-        return sum(map(key2, lst))
-
-    reachable = {0: []}
+    # As in subset_closest_to_sum, subsets are (item, rest) links; their sums by key2 are kept alongside
+    reachable = {0: None}
+    key2_sums = {0: 0}
 
-    closest_list = []
+    closest_list = None
+    closest_key2_sum = None
     closest_sum = None
 
-    exact_match = []
+    exact_match = None
+    exact_match_key2_sum = None
 
+    remaining = sum(map(key, lst))  # the most the current and later items can still add
     for item in lst:
+        value = key(item)
+        value2 = key2(item)
         # We traverse in reversed order all reachable resource numbers
         # The order is reversed so that elements are not added multiple times to the same combination
-        for number in sorted(reachable.keys(), reverse=True):
-            result = key(item) + number
-            result_list = reachable[number] + [item]
+        for number in sorted(reachable, reverse=True):
+            # sums that can no longer reach the closest sum can't change the result, nor can the smaller ones
+            if closest_sum and number + remaining < closest_sum:
+                break
+
+            result = value + number
+            result_list = (item, reachable[number])
+            result_key2_sum = key2_sums[number] + value2
 
             if result > target:
                 continue
             elif result == target:
-                if not exact_match or _sum(exact_match) > _sum(result_list):
+                if exact_match is None or exact_match_key2_sum > result_key2_sum:
                     exact_match = result_list
+                    exact_match_key2_sum = result_key2_sum
             else:
-                if not closest_sum or closest_sum < result or (closest_sum == result and _sum(closest_list) > _sum(result_list)):
+                if not closest_sum or closest_sum < result or (closest_sum == result and closest_key2_sum > result_key2_sum):
                     closest_sum = result
                     closest_list = result_list
-                if result not in reachable or _sum(reachable[result]) > _sum(result_list):
+                    closest_key2_sum = result_key2_sum
+                if result not in reachable or key2_sums[result] > result_key2_sum:
                     reachable[result] = result_list
+                    key2_sums[result] = result_key2_sum
+        remaining -= value
 
-    return exact_match if exact_match else closest_list
+    return _linked_items(exact_match if exact_match is not None else closest_list)